@@ -0,0 +1,65 @@
+import hashlib
+
+import numpy as np
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+# Each hop after the first scales a path's affinity by this much, so
+# Techwear -> Minimal -> Formal counts for 0.5 * 0.8 * HOP_DECAY
+HOP_DECAY = 0.6
+
+# ==============================================================================
+# AFFINITY MATRICES
+# ==============================================================================
+def affinity_matrix(relations, keys):
+    """
+    Dense A[other, key] over keys: the other -> key affinity, falling back
+    to key -> other (symmetry) when that is missing, and 0 on the diagonal.
+    """
+    n = len(keys)
+    direct = np.zeros((n, n))
+    for i, other in enumerate(keys):
+        for j, key in enumerate(keys):
+            if i != j:
+                direct[i, j] = (
+                    relations.get(other, {}).get(key, 0)
+                    or relations.get(key, {}).get(other, 0)
+                )
+    return direct
+
+def affinity_closure(direct, decay=HOP_DECAY):
+    """
+    Best multi-hop affinity: the max over paths of the product of their
+    edge affinities, times decay for every hop after the first. Max-product
+    Floyd-Warshall; with affinities <= 1 a cycle never improves a path.
+    """
+    best = np.array(direct, dtype=np.float64)
+    for k in range(len(best)):
+        best = np.maximum(best, np.outer(best[:, k], best[k, :]) * decay)
+    np.fill_diagonal(best, 0)
+    return best
+
+class AffinityTable:
+    """
+    A relation dict compiled once for inference: its keys in a fixed order,
+    their index, the one-hop matrix and its multi-hop closure.
+    """
+    def __init__(self, relations, keys, decay=HOP_DECAY):
+        self.keys = tuple(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.decay = decay
+        self.direct = affinity_matrix(relations, self.keys)
+        self.closure = affinity_closure(self.direct, decay)
+        self.direct.setflags(write=False)
+        self.closure.setflags(write=False)
+        # Content key for caches: a Streamlit rerun rebuilds equal tables as new objects
+        h = hashlib.blake2b(repr((self.keys, decay)).encode("utf-8"), digest_size=16)
+        h.update(self.direct.tobytes())
+        self.digest = h.hexdigest()
+
+    def matrix(self, multi_hop=True):
+        return self.closure if multi_hop else self.direct
+
+    def lookup(self, other, key, multi_hop=True):
+        return float(self.matrix(multi_hop)[self.index[other], self.index[key]])
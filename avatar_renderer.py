@@ -0,0 +1,429 @@
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from coverage_draw import CoverageDraw
+from image_encoding import cached_render
+from result_cache import get_cache
+from svg_draw import OUTPUT_SVG, SvgDraw
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+# Enhanced Palette (RGB), shared with StyleConfig.COLOR_MAP
+PALETTE = {
+    "Black": (20, 20, 20),
+    "White": (245, 245, 245),
+    "Gray": (120, 120, 125),
+    "Navy": (30, 45, 80),
+    "Brown": (100, 70, 50),
+    "Beige": (220, 210, 190),
+    "Green": (55, 90, 60),
+    "Red": (160, 40, 40)
+}
+
+AVATAR_SIZE = (250, 450)
+# Drawn at 2x and downsampled for antialiasing
+CANVAS_SIZE = (500, 900)
+BACKGROUND = (250, 250, 250)
+SKIN = (235, 215, 200)
+SHOE = (30, 30, 30)
+# Color roles of the mask renderer, in the order of its weight planes
+ROLES = ("background", "skin", "main", "accent", "shoe")
+# Pixels between avatars in a strip (about Streamlit's column gap)
+STRIP_GAP = 24
+ATLAS_DIR = ".avatar_atlas"
+ATLAS_NAME = "avatars.atlas"
+ATLAS_VERSION = 2
+# Atlas layout: raw RGB avatars | index JSON | trailer (magic, version, index length)
+ATLAS_TRAILER = struct.Struct("<4sIQ")
+ATLAS_MAGIC = b"AVAT"
+# Backend the apps display with; follows the svg_draw.OUTPUT_SVG switch
+AVATAR_BACKEND = "svg" if OUTPUT_SVG else "pil"
+
+# 8 x 8 colors x skirt x outer = 256 signatures of ~330 KB (250x450 RGB), ~85 MB at most
+RENDER_CACHE_SIZE = 256
+# Shared by every session; PIL drops the GIL in resize and encode
+RENDER_THREADS = min(4, os.cpu_count() or 1)
+
+# ==============================================================================
+# AVATAR RENDERER
+# ==============================================================================
+def outfit_signature(outfit):
+    # Everything render() looks at; outfits with equal signatures look identical
+    meta = outfit["meta"]
+    return (
+        outfit["main_color"],
+        outfit["accent_color"],
+        bool(meta["is_skirt"]),
+        bool(meta["has_outer"] and outfit["items"]["outer"])
+    )
+
+def role_fills(main_color, accent_color):
+    return {
+        "background": BACKGROUND,
+        "skin": SKIN,
+        "main": PALETTE[main_color],
+        "accent": PALETTE[accent_color],
+        "shoe": SHOE
+    }
+
+class AvatarRenderer:
+    @staticmethod
+    def render(outfit, backend="pil"):
+        """
+        Cached avatar for an outfit. The image is shared between reruns and
+        sessions, so callers must treat it as read-only (copy() before drawing).
+        backend is a key of RENDER_BACKENDS.
+        """
+        cache = get_cache("avatar_render", maxsize=RENDER_CACHE_SIZE)
+        signature = outfit_signature(outfit)
+        return cache.get_or_compute(
+            (backend,) + signature, lambda: AvatarRenderer.lookup(signature, backend)
+        )
+
+    @staticmethod
+    def render_strip(outfits, backend="pil", columns=None, gap=STRIP_GAP):
+        """
+        Several avatars composited onto one canvas: a strip by default, or a
+        grid of `columns` avatars per row. One image means one encode and one
+        media upload per rerun instead of one per look. backend="svg" returns
+        an svg_draw.SvgDraw instead of a PIL image.
+        """
+        w, h = AVATAR_SIZE
+        columns = columns or max(len(outfits), 1)
+        rows = max(-(-len(outfits) // columns), 1)
+        size = (columns * (w + gap) - gap, rows * (h + gap) - gap)
+
+        if backend == "svg":
+            # Vector strip: each avatar's canvas shapes scaled into its cell
+            strip = SvgDraw(size, BACKGROUND)
+            for i, outfit in enumerate(outfits):
+                row, col = divmod(i, columns)
+                with strip.group(col * (w + gap), row * (h + gap), w / CANVAS_SIZE[0]):
+                    main_color, accent_color, is_skirt, has_outer = outfit_signature(outfit)
+                    AvatarRenderer.paint(strip, role_fills(main_color, accent_color), is_skirt, has_outer)
+            return strip
+
+        strip = Image.new("RGB", size, BACKGROUND)
+        for i, avatar in enumerate(AvatarRenderer.render_many(outfits, backend)):
+            row, col = divmod(i, columns)
+            strip.paste(avatar, (col * (w + gap), row * (h + gap)))
+        return strip
+
+    @staticmethod
+    def render_many(outfits, backend="pil", parallel=True):
+        """render() for each outfit, in order; concurrently in the shared render pool."""
+        if not parallel or len(outfits) < 2:
+            return [AvatarRenderer.render(o, backend) for o in outfits]
+        return list(render_pool().map(lambda o: AvatarRenderer.render(o, backend), outfits))
+
+    @staticmethod
+    def encode_many(outfits, backend="pil", parallel=True):
+        """One cached EncodedImage per outfit, rendered and encoded in the render pool."""
+        def encode(outfit):
+            key = ("avatar", backend, outfit_signature(outfit))
+            return cached_render(key, lambda: AvatarRenderer.render(outfit, backend))
+
+        if not parallel or len(outfits) < 2:
+            return [encode(o) for o in outfits]
+        return list(render_pool().map(encode, outfits))
+
+    @staticmethod
+    def encode_strip(outfits, backend="pil", columns=None, gap=STRIP_GAP):
+        # Cached EncodedImage of the strip; pass .data with output_format=.format
+        key = ("avatar_strip", backend, columns, gap) + tuple(outfit_signature(o) for o in outfits)
+        return cached_render(key, lambda: AvatarRenderer.render_strip(outfits, backend, columns, gap))
+
+    @staticmethod
+    def lookup(signature, backend="pil"):
+        # Slice the prebuilt atlas (drawn with "pil"); draw if it is missing or out of date
+        if backend == "pil":
+            img = AvatarAtlas.get().avatar(signature)
+            if img is not None:
+                return img
+        return RENDER_BACKENDS[backend](*signature)
+
+    @staticmethod
+    def draw(main_color, accent_color, is_skirt, has_outer):
+        # High-res canvas for anti-aliasing (resize down later)
+        img = Image.new("RGB", CANVAS_SIZE, BACKGROUND)
+        fills = role_fills(main_color, accent_color)
+        AvatarRenderer.paint(ImageDraw.Draw(img), fills, is_skirt, has_outer)
+
+        # Resize for better quality (Antialiasing hack)
+        return img.resize(AVATAR_SIZE, resample=Image.LANCZOS)
+
+    @staticmethod
+    def draw_analytic(main_color, accent_color, is_skirt, has_outer):
+        # Straight at the output size with analytic edge coverage: no 2x canvas, no LANCZOS
+        canvas = CoverageDraw(AVATAR_SIZE, BACKGROUND, scale=AVATAR_SIZE[0] / CANVAS_SIZE[0])
+        AvatarRenderer.paint(canvas, role_fills(main_color, accent_color), is_skirt, has_outer)
+        return canvas.image()
+
+    @staticmethod
+    def paint(draw, fills, is_skirt, has_outer):
+        # Shapes on the 500x900 canvas; fills maps each color role to a fill
+        c_main = fills["main"]
+        c_accent = fills["accent"]
+        c_skin = fills["skin"]
+
+        # --- DRAWING LAYERS ---
+        
+        # 1. Body/Head
+        # Head
+        draw.ellipse([200, 50, 300, 160], fill=c_skin)
+        # Neck
+        draw.rectangle([235, 150, 265, 190], fill=c_skin)
+        
+        # 2. Bottoms
+        # If skirt, draw specialized shape
+        pants_color = c_main # Monochromatic base usually looks good for bottoms
+        
+        if is_skirt:
+            # Skirt shape
+            draw.polygon([
+                (180, 450), (320, 450), # Waist
+                (360, 650), (140, 650)  # Hem
+            ], fill=pants_color)
+            # Legs
+            draw.rectangle([210, 650, 240, 800], fill=c_skin)
+            draw.rectangle([260, 650, 290, 800], fill=c_skin)
+        else:
+            # Pants shape
+            draw.rectangle([180, 450, 320, 800], fill=pants_color)
+            # Gap between legs
+            draw.polygon([(245, 450), (255, 450), (255, 800), (245, 800)], fill=fills["background"])
+
+        # 3. Inner Top
+        inner_color = c_accent
+        draw.rectangle([180, 180, 320, 460], fill=inner_color) # Torso
+        draw.rectangle([150, 180, 190, 350], fill=inner_color) # Left Arm base
+        draw.rectangle([310, 180, 350, 350], fill=inner_color) # Right Arm base
+        
+        # Hands
+        draw.ellipse([140, 340, 190, 390], fill=c_skin)
+        draw.ellipse([310, 340, 360, 390], fill=c_skin)
+
+        # 4. Outerwear (if creates)
+        if has_outer:
+            outer_color = c_main
+            # Open Jacket look
+            draw.rectangle([140, 170, 210, 480], fill=outer_color) # Left panel
+            draw.rectangle([290, 170, 360, 480], fill=outer_color) # Right panel
+            # Sleeves
+            draw.rectangle([120, 180, 170, 420], fill=outer_color)
+            draw.rectangle([330, 180, 380, 420], fill=outer_color)
+
+        # 5. Shoes
+        shoe_color = fills["shoe"]
+        draw.rectangle([190, 800, 240, 850], fill=shoe_color)
+        draw.rectangle([260, 800, 310, 850], fill=shoe_color)
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def render_pool():
+    # Created on first use so importing the module starts no threads
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(
+                max_workers=RENDER_THREADS, thread_name_prefix="avatar-render"
+            )
+        return _render_pool
+
+# ==============================================================================
+# MASK RENDERER (NumPy)
+# ==============================================================================
+class MaskRenderer:
+    """
+    Drop-in for AvatarRenderer.draw that never draws per avatar. For each of
+    the 4 layouts (skirt x outer) the canvas is painted once with role
+    labels and each role's coverage is LANCZOS-downsampled, in float, to an
+    antialiased 250x450 mask. Resampling is linear, so an avatar is just the
+    role colors weighted by those masks: solid pixels come from a 5-entry
+    lookup table and only the antialiased edges (~8% of pixels) need the
+    (pixels x roles) @ (roles x RGB) blend.
+    """
+    _masks = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def masks(cls, is_skirt, has_outer):
+        layout = (bool(is_skirt), bool(has_outer))
+        with cls._lock:
+            masks = cls._masks.get(layout)
+            if masks is None:
+                masks = cls.rasterize(*layout)
+                cls._masks[layout] = masks
+            return masks
+
+    @staticmethod
+    def rasterize(is_skirt, has_outer):
+        """(solid role per pixel, edge pixel indices, edge coverage weights)"""
+        labels = Image.new("L", CANVAS_SIZE, ROLES.index("background"))
+        label_fills = {role: i for i, role in enumerate(ROLES)}
+        AvatarRenderer.paint(ImageDraw.Draw(labels), label_fills, is_skirt, has_outer)
+        labels = np.asarray(labels)
+
+        planes = []
+        for i in range(len(ROLES)):
+            coverage = Image.fromarray((labels == i).astype(np.float32))
+            planes.append(np.asarray(coverage.resize(AVATAR_SIZE, resample=Image.LANCZOS)))
+        weights = np.stack(planes, axis=-1).reshape(-1, len(ROLES))
+
+        # Fully covered by one role -> that role; anything else is an edge
+        solid = np.abs(weights - 1.0) < 1e-4
+        roles = np.where(solid.any(axis=1), solid.argmax(axis=1), len(ROLES)).astype(np.uint8)
+        edges = np.flatnonzero(roles == len(ROLES))
+        return roles, edges, weights[edges]
+
+    @classmethod
+    def draw(cls, main_color, accent_color, is_skirt, has_outer):
+        roles, edges, edge_weights = cls.masks(is_skirt, has_outer)
+        fills = role_fills(main_color, accent_color)
+        colors = np.array([fills[role] for role in ROLES], dtype=np.float32)
+
+        # RGBX pixels as uint32 so a gather moves whole pixels
+        lut = np.zeros((len(ROLES) + 1, 4), dtype=np.uint8)
+        lut[:len(ROLES), :3] = colors
+        px = np.take(lut.view(np.uint32).ravel(), roles)
+        blend = np.zeros((len(edges), 4), dtype=np.uint8)
+        blend[:, :3] = np.clip(edge_weights @ colors + 0.5, 0, 255)
+        px[edges] = blend.view(np.uint32).ravel()
+        return Image.frombytes("RGB", AVATAR_SIZE, px, "raw", "RGBX")
+
+RENDER_BACKENDS = {
+    "pil": AvatarRenderer.draw,
+    "masks": MaskRenderer.draw,
+    "analytic": AvatarRenderer.draw_analytic
+}
+
+# ==============================================================================
+# AVATAR ATLAS
+# ==============================================================================
+def all_signatures():
+    return list(itertools.product(PALETTE, PALETTE, (False, True), (False, True)))
+
+def _signature_key(signature):
+    main_color, accent_color, is_skirt, has_outer = signature
+    return f"{main_color}|{accent_color}|{int(is_skirt)}|{int(has_outer)}"
+
+def _draw_job(signature):
+    return AvatarRenderer.draw(*signature).tobytes()
+
+def geometry_fingerprint():
+    """
+    Hash of reference renders, one per skirt / outer combination: changes to
+    the shapes in AvatarRenderer.paint change it, so a stale atlas is refused.
+    """
+    main_color, accent_color = list(PALETTE)[:2]
+    h = hashlib.blake2b(digest_size=16)
+    for is_skirt, has_outer in itertools.product((False, True), (False, True)):
+        h.update(AvatarRenderer.draw(main_color, accent_color, is_skirt, has_outer).tobytes())
+    return h.hexdigest()
+
+def build_atlas(atlas_dir=ATLAS_DIR, workers=None):
+    """
+    Render every signature once (in a process pool) into one raw RGB strip,
+    avatar after avatar, followed by a {signature: slot} index. Each avatar is
+    a contiguous byte range, so the app maps the file and slices it. Avatars
+    and index are swapped in by a single atomic replace.
+    """
+    os.makedirs(atlas_dir, exist_ok=True)
+    atlas_path = os.path.join(atlas_dir, ATLAS_NAME)
+
+    signatures = all_signatures()
+    index = {
+        "size": list(AVATAR_SIZE),
+        # Palette or shape changes invalidate the atlas
+        "palette": {name: list(rgb) for name, rgb in PALETTE.items()},
+        "geometry": geometry_fingerprint(),
+        "slots": {_signature_key(sig): slot for slot, sig in enumerate(signatures)}
+    }
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        with open(atlas_path + ".tmp", "wb") as out:
+            for data in pool.map(_draw_job, signatures, chunksize=8):
+                out.write(data)
+            index = json.dumps(index, ensure_ascii=False).encode("utf-8")
+            out.write(index)
+            out.write(ATLAS_TRAILER.pack(ATLAS_MAGIC, ATLAS_VERSION, len(index)))
+    os.replace(atlas_path + ".tmp", atlas_path)
+    return len(signatures)
+
+class AvatarAtlas:
+    """
+    Read-only, memory-mapped avatar atlas. Workers share the file through
+    the page cache and an avatar is an Image over a slice of the map.
+    """
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, slots, buffer=None):
+        # {signature key: slot}
+        self.slots = slots
+        self._buffer = buffer
+
+    @classmethod
+    def get(cls, atlas_dir=ATLAS_DIR):
+        with cls._lock:
+            atlas = cls._instances.get(atlas_dir)
+            if atlas is None:
+                atlas = cls.open(atlas_dir)
+                cls._instances[atlas_dir] = atlas
+            return atlas
+
+    @classmethod
+    def open(cls, atlas_dir):
+        # Missing, stale or truncated atlas: empty, render() draws instead
+        try:
+            with open(os.path.join(atlas_dir, ATLAS_NAME), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return cls({})
+
+        # Index and trailer come from the same mapping as the avatars
+        if len(mm) < ATLAS_TRAILER.size:
+            return cls({})
+        magic, version, index_len = ATLAS_TRAILER.unpack_from(mm, len(mm) - ATLAS_TRAILER.size)
+        avatars_end = len(mm) - ATLAS_TRAILER.size - index_len
+        if magic != ATLAS_MAGIC or version != ATLAS_VERSION or avatars_end < 0:
+            return cls({})
+        try:
+            index = json.loads(mm[avatars_end:avatars_end + index_len].decode("utf-8"))
+        except ValueError:
+            return cls({})
+
+        palette = {name: tuple(rgb) for name, rgb in index.get("palette", {}).items()}
+        if (tuple(index.get("size", ())) != AVATAR_SIZE
+                or palette != PALETTE
+                or len(index["slots"]) * _avatar_bytes() > avatars_end
+                or index.get("geometry") != geometry_fingerprint()):
+            return cls({})
+        return cls(index["slots"], memoryview(mm))
+
+    def avatar(self, signature):
+        slot = self.slots.get(_signature_key(signature))
+        if slot is None:
+            return None
+        n = _avatar_bytes()
+        return Image.frombuffer(
+            "RGB", AVATAR_SIZE, self._buffer[slot * n:(slot + 1) * n], "raw", "RGB", 0, 1
+        )
+
+def _avatar_bytes():
+    return AVATAR_SIZE[0] * AVATAR_SIZE[1] * 3
+
+if __name__ == "__main__":
+    atlas_dir = sys.argv[1] if len(sys.argv) > 1 else ATLAS_DIR
+    print(f"{build_atlas(atlas_dir)} avatars rendered into {atlas_dir}")
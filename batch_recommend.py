@@ -0,0 +1,100 @@
+import numpy as np
+
+# ==============================================================================
+# BATCH RECOMMENDER
+# ==============================================================================
+def recommend_batch(catalog, gender, styles, colors, style_scores, color_scores,
+                    k=3, min_weight=12, rng=None, chunk_size=65536):
+    """
+    Vectorized ImageRecommender.recommend for many profiles at once.
+
+    style_scores is (n_users x len(styles)), color_scores is
+    (n_users x len(colors)), columns in the order of `styles` / `colors`.
+    Returns an (n_users x k) int64 array of catalog image IDs (indices into
+    catalog.paths), best pick first, padded with -1 when a user has fewer
+    than k eligible images.
+
+    Each user gets k distinct images drawn without replacement with
+    probability proportional to style + color weight, exactly like the
+    per-request sampler. Images in a cell share a weight, so instead of one
+    Efraimidis-Spirakis key per image we draw the k largest keys of each
+    cell from uniform order statistics and then k distinct images inside
+    the cell: the work is O(n_users * cells * k), independent of how many
+    images each cell holds.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    style_scores = np.asarray(style_scores, dtype=np.float64)
+    color_scores = np.asarray(color_scores, dtype=np.float64)
+    n_users = style_scores.shape[0]
+    out = np.full((n_users, k), -1, dtype=np.int64)
+    if k <= 0 or n_users == 0:
+        return out
+
+    # Flattened (style, color) cells that actually hold images
+    cell_index, cell_start, cell_count = [], [], []
+    for i, style in enumerate(styles):
+        for j, color in enumerate(colors):
+            start, end = catalog.cell_ranges.get((gender, style, color), (0, 0))
+            if end > start:
+                cell_index.append(i * len(colors) + j)
+                cell_start.append(start)
+                cell_count.append(end - start)
+    if not cell_index:
+        return out
+    cell_index = np.array(cell_index)
+    cell_start = np.array(cell_start, dtype=np.int64)
+    cell_count = np.array(cell_count, dtype=np.int64)
+
+    n_cells = len(cell_index)
+    ranks = np.arange(k)
+    # Rank r inside a cell exists only if the cell has more than r images
+    rank_valid = ranks[None, :] < cell_count[:, None]
+    rank_denom = np.maximum(cell_count[:, None] - ranks[None, :], 1)
+    picks = min(k, n_cells * k)
+
+    for lo in range(0, n_users, chunk_size):
+        hi = min(lo + chunk_size, n_users)
+        b = hi - lo
+
+        # (b x cells) weights via broadcasting, then the min_weight cut
+        weights = (
+            style_scores[lo:hi, :, None] + color_scores[lo:hi, None, :]
+        ).reshape(b, -1)[:, cell_index]
+        eligible = (weights >= min_weight) & (weights > 0)
+
+        # log of the r-th largest of m uniforms: sum_{i<=r} log(V_i) / (m - i)
+        log_u = np.cumsum(np.log(rng.random((b, n_cells, k))) / rank_denom, axis=2)
+        keys = log_u / np.where(eligible, weights, 1.0)[:, :, None]
+        keys[~(eligible[:, :, None] & rank_valid[None])] = -np.inf
+        keys = keys.reshape(b, n_cells * k)
+
+        # Top `picks` keys per user, best first
+        top = np.argpartition(-keys, picks - 1, axis=1)[:, :picks]
+        top_keys = np.take_along_axis(keys, top, axis=1)
+        order = np.argsort(-top_keys, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_keys = np.take_along_axis(top_keys, order, axis=1)
+
+        cell = top // k
+        rank = top % k
+        offsets = _distinct_offsets(rng, cell_count, b, k)
+        image_ids = cell_start[cell] + offsets[np.arange(b)[:, None], cell, rank]
+        out[lo:hi, :picks] = np.where(np.isfinite(top_keys), image_ids, -1)
+
+    return out
+
+def _distinct_offsets(rng, cell_count, b, k):
+    # (b x cells x k) offsets; the first min(k, m) of a cell are distinct in [0, m)
+    m = cell_count[None, :]
+    big = np.iinfo(np.int64).max
+    offsets = np.full((b, len(cell_count), k), big, dtype=np.int64)
+    for r in range(k):
+        x = (rng.random((b, len(cell_count))) * np.maximum(m - r, 1)).astype(np.int64)
+        # Map x to the x-th offset not taken yet: step over taken ones in order
+        for taken in np.sort(offsets[:, :, :r], axis=2).transpose(2, 0, 1):
+            x += x >= taken
+        offsets[:, :, r] = np.where(r < m, x, big)
+    return offsets
+
+def ids_to_paths(catalog, ids):
+    return [[catalog.paths[i] for i in row if i >= 0] for row in ids]
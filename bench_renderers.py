@@ -0,0 +1,360 @@
+import argparse
+import ast
+import inspect
+import itertools
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import PIL
+
+from avatar_renderer import ATLAS_DIR, AvatarAtlas, MaskRenderer
+from image_encoding import encode_image
+from result_cache import clear_caches
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+BENCH_VERSION = 1
+DEFAULT_OUTPUT = "bench_renderers.json"
+CORPUS_SEED = 1234
+GENDERS = ("Male", "Female")
+# Renderers without inputs are still called this many times per round
+FIXED_CASES = 64
+# Slower than the baseline by more than this is flagged by --compare
+REGRESSION_RATIO = 1.10
+
+# ==============================================================================
+# HEADLESS LOADING
+# ==============================================================================
+def load_script(path, env=None):
+    """
+    The definitions of a Streamlit script without running its page: imports
+    (except streamlit), functions, classes and UPPER_CASE constants are
+    executed, every other top-level statement (st.* calls, the UI) is dropped.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    keep = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            node.names = [a for a in node.names if a.name.split(".")[0] != "streamlit"]
+            if node.names:
+                keep.append(node)
+        elif isinstance(node, ast.ImportFrom):
+            if (node.module or "").split(".")[0] != "streamlit":
+                keep.append(node)
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            keep.append(node)
+        elif isinstance(node, ast.Assign) and all(
+            isinstance(t, ast.Name) and t.id.isupper() for t in node.targets
+        ):
+            keep.append(node)
+
+    ns = {"__name__": "__bench__", "__file__": path}
+    ns.update(env or {})
+    exec(compile(ast.Module(body=keep, type_ignores=[]), path, "exec"), ns)
+    return ns
+
+# ==============================================================================
+# CORPUS
+# ==============================================================================
+# Each builder turns a loaded script into a fixed list of zero-argument render
+# calls. Inputs come from the script's own generators with seeded RNGs, so
+# every run (and every commit) renders the same outfits.
+def _kwargs(fn, values):
+    # Fill fn's parameters by name; the ones not in values keep their defaults
+    return {p: values[p] for p in inspect.signature(fn).parameters if p in values}
+
+def _bind(fn, kwargs, seed):
+    # Renderers that draw random details get a fresh RNG per call
+    if "rng" in kwargs:
+        return lambda: fn(**dict(kwargs, rng=random.Random(seed)))
+    return lambda: fn(**kwargs)
+
+def huku_cases(ns, svg=False):
+    generate_image = ns["generate_image"]
+    cases = []
+    for i, (gender, genre, color) in enumerate(
+        itertools.product(GENDERS, ns["GENRES"], ns["COLORS"])
+    ):
+        seed = CORPUS_SEED + i
+        # Some pages read their gender widget as a global
+        ns["gender"] = gender
+        values = {
+            "gender": gender, "genre": genre, "color": color, "color_name": color,
+            "rng": random.Random(seed), "svg": svg
+        }
+        if "generate_outfit" in ns:
+            values["outfit"] = ns["generate_outfit"](**_kwargs(ns["generate_outfit"], values))
+        cases.append(_bind(generate_image, _kwargs(generate_image, values), seed))
+    return cases
+
+def toku1_cases(ns, svg=False):
+    return [
+        _bind(ns["render_avatar"], {"outfit": outfit, "svg": svg}, None)
+        for outfit in ns["OUTFIT_DB"]
+    ]
+
+def fixed_cases(ns):
+    render = ns["AvatarRenderer"].render
+    return [render] * FIXED_CASES
+
+def toku5_cases(ns):
+    render = ns["AvatarRenderer"].render
+    return [lambda c=c: render(c) for c in ns["StyleConfig"].COLORS]
+
+def stylist_outfits(ns):
+    config = ns["StyleConfig"]
+    color_scores = {c: 5 for c in config.COLORS}
+    genres, colors = config.GENRES, config.COLORS
+    # Scripts with a compiled StyleConfig generate from genre / color IDs
+    if "STYLE" in ns:
+        genres, colors = range(len(genres)), range(len(colors))
+    outfits = []
+    for i, (gender, use_outer, genre, color) in enumerate(
+        itertools.product(GENDERS, (False, True), genres, colors)
+    ):
+        rng = random.Random(CORPUS_SEED + i)
+        outfits.append(
+            ns["OutfitGenerator"].create(genre, color, gender, use_outer, color_scores, rng)
+        )
+    return outfits
+
+def stylist_cases(ns, backend="pil"):
+    render = ns["AvatarRenderer"].render
+    return [lambda o=o: render(o, backend) for o in stylist_outfits(ns)]
+
+def stylist_strip_cases(ns, backend="svg"):
+    render_strip = ns["AvatarRenderer"].render_strip
+    outfits = stylist_outfits(ns)
+    return [lambda o=o: render_strip(o, backend) for o in zip(outfits[0::3], outfits[1::3], outfits[2::3])]
+
+def stylist_batch_cases(ns, parallel=True):
+    # The three displayed looks, rendered and encoded together
+    encode_many = ns["AvatarRenderer"].encode_many
+    outfits = stylist_outfits(ns)
+    return [
+        lambda o=list(o): encode_many(o, "pil", parallel)
+        for o in zip(outfits[0::3], outfits[1::3], outfits[2::3])
+    ]
+
+HUKU_SCRIPTS = [
+    "huku.py", "huku2.py", "huku4.py", "huku5.py", "huku6.py",
+    "huku7.py", "huku8.py", "huku9.py", "huku10.py"
+]
+
+# {name: (script, case builder)}
+TARGETS = {}
+for script in HUKU_SCRIPTS:
+    TARGETS[f"{script}:generate_image"] = (script, huku_cases)
+    TARGETS[f"{script}:generate_image[svg]"] = (script, lambda ns: huku_cases(ns, svg=True))
+TARGETS["toku1.py:render_avatar"] = ("toku1.py", toku1_cases)
+TARGETS["toku1.py:render_avatar[svg]"] = ("toku1.py", lambda ns: toku1_cases(ns, svg=True))
+TARGETS["toku2.py:AvatarRenderer.render"] = ("toku2.py", fixed_cases)
+TARGETS["toku3.py:AvatarRenderer.render"] = ("toku3.py", fixed_cases)
+TARGETS["toku5.py:AvatarRenderer.render"] = ("toku5.py", toku5_cases)
+for script in ("tokumurakunn.py", "tokumurakunn2.py"):
+    for backend in ("pil", "masks", "analytic"):
+        TARGETS[f"{script}:AvatarRenderer.render[{backend}]"] = (
+            script, lambda ns, b=backend: stylist_cases(ns, b)
+        )
+    TARGETS[f"{script}:AvatarRenderer.render_strip[svg]"] = (script, stylist_strip_cases)
+TARGETS["tokumurakunn2.py:AvatarRenderer.encode_many[serial]"] = (
+    "tokumurakunn2.py", lambda ns: stylist_batch_cases(ns, parallel=False)
+)
+TARGETS["tokumurakunn2.py:AvatarRenderer.encode_many[threads]"] = (
+    "tokumurakunn2.py", stylist_batch_cases
+)
+
+# ==============================================================================
+# MEASUREMENT
+# ==============================================================================
+def _percentile(sorted_values, q):
+    return sorted_values[round(q * (len(sorted_values) - 1))]
+
+def _encoded_bytes(out):
+    # EncodedImage (PNG or SVG), SvgDraw, or a PIL image encoded the default way
+    if out is None:
+        raise TypeError("renderer returned None")
+    if isinstance(out, list):
+        return sum(_encoded_bytes(o) for o in out)
+    if hasattr(out, "to_svg"):
+        out = out.encode()
+    if not hasattr(out, "digest"):
+        out = encode_image(out)
+    return out.size
+
+def cold_start():
+    # The LRUs plus the class-level memo clear_caches() does not reach
+    clear_caches()
+    MaskRenderer._masks.clear()
+
+def ignore_atlas():
+    # A local .avatar_atlas would turn "pil" renders into mmap slices, making
+    # results depend on the working directory: pin an empty atlas instead
+    AvatarAtlas._instances[ATLAS_DIR] = AvatarAtlas({})
+
+def run_target(name, rounds=3, warm=False):
+    """
+    Time every corpus render `rounds` times. Caches are cleared before each
+    call unless warm, so the numbers are the cost of a real render (and
+    encode, for renderers that return encoded bytes). The avatar atlas is
+    never used, so results don't depend on local build artifacts.
+    """
+    ignore_atlas()
+    script, build = TARGETS[name]
+    try:
+        cases = build(load_script(script))
+    except Exception as exc:
+        return {"error": f"{type(exc).__name__}: {exc}"}
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    sizes = []
+    # A case that raises is dropped and reported instead of sinking the target
+    failures = {}
+    try:
+        for r in range(rounds):
+            for i, case in enumerate(cases):
+                if i in failures:
+                    continue
+                if not warm:
+                    cold_start()
+                start = time.perf_counter_ns()
+                try:
+                    out = case()
+                    elapsed = (time.perf_counter_ns() - start) / 1e6
+                    if r == 0:
+                        sizes.append(_encoded_bytes(out))
+                except Exception as exc:
+                    failures[i] = f"{type(exc).__name__}: {exc}"
+                    continue
+                timings.append(elapsed)
+        if not timings:
+            return {"error": next(iter(failures.values()))}
+
+        # Python-level peak for one pass (allocations made by PIL's C core are
+        # not traced; the RSS peak below covers them)
+        tracemalloc.start()
+        for i, case in enumerate(cases):
+            if i in failures:
+                continue
+            if not warm:
+                cold_start()
+            case()
+        py_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    except Exception as exc:
+        return {"error": f"{type(exc).__name__}: {exc}"}
+
+    timings.sort()
+    return {
+        "cases": len(cases),
+        "failed_cases": len(failures),
+        "failures": sorted(set(failures.values())),
+        "renders": len(timings),
+        "ms": {
+            "mean": sum(timings) / len(timings),
+            "p50": _percentile(timings, 0.50),
+            "p90": _percentile(timings, 0.90),
+            "p99": _percentile(timings, 0.99),
+            "max": timings[-1]
+        },
+        "encoded_bytes": {"mean": sum(sizes) / len(sizes), "max": max(sizes)},
+        "py_peak_kb": py_peak / 1024,
+        # ru_maxrss is in KB on Linux
+        "rss_peak_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    }
+
+def run_all(names, rounds=3, warm=False, jobs=1):
+    # One fresh process per target: no shared caches, comparable memory peaks
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, max_tasks_per_child=1) as pool:
+        futures = {name: pool.submit(run_target, name, rounds, warm) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+# ==============================================================================
+# REPORTING
+# ==============================================================================
+def print_report(results):
+    print(f"{'target':<52} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>8} {'rss KB':>8}")
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<52} error: {r['error']}")
+            continue
+        print(
+            f"{name:<52} {r['ms']['p50']:>8.3f} {r['ms']['p99']:>8.3f} "
+            f"{r['encoded_bytes']['mean']:>8.0f} {r['rss_peak_growth_kb']:>8}"
+        )
+        for failure in r["failures"]:
+            print(f"    {r['failed_cases']} failed case(s): {failure}")
+
+def compare(results, baseline):
+    # p50 and size ratios against a previous run; returns the regressed targets
+    regressed = []
+    print(f"{'target':<52} {'p50 x':>8} {'bytes x':>8}")
+    for name, r in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "error" in old or "error" in r:
+            continue
+        speed = r["ms"]["p50"] / old["ms"]["p50"]
+        size = r["encoded_bytes"]["mean"] / old["encoded_bytes"]["mean"]
+        flag = "  <-- slower" if speed > REGRESSION_RATIO else ""
+        print(f"{name:<52} {speed:>8.2f} {size:>8.2f}{flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every avatar / outfit renderer headlessly.")
+    parser.add_argument("filters", nargs="*", help="only targets whose name contains one of these")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="keep result caches between calls")
+    parser.add_argument("--jobs", type=int, default=1, help="targets run in parallel (skews timings)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", metavar="BASELINE_JSON")
+    args = parser.parse_args()
+
+    names = [n for n in TARGETS if not args.filters or any(f in n for f in args.filters)]
+    results = run_all(names, args.rounds, args.warm, args.jobs)
+    report = {
+        "version": BENCH_VERSION,
+        "environment": environment(),
+        "config": {"rounds": args.rounds, "warm": args.warm, "seed": CORPUS_SEED},
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print_report(results)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline):
+            sys.exit(1)
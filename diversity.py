@@ -0,0 +1,123 @@
+import random
+
+import numpy as np
+
+from sampling import weighted_sample
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+# Relevance vs. novelty: 1.0 is plain ranking, 0.0 only spreads the picks
+MMR_LAMBDA = 0.5
+# Candidates drawn (weighted) before re-ranking picks the displayed few; small
+# enough that the draw still decides which looks are in the running
+MMR_POOL = 16
+
+# ==============================================================================
+# PAIRWISE SIMILARITY
+# ==============================================================================
+def color_similarity(rgb):
+    """(n x n) 1 - RGB distance / the largest possible distance, from an (n x 3) palette."""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    dist = np.sqrt(((rgb[:, None, :] - rgb[None, :, :]) ** 2).sum(axis=2))
+    return 1 - dist / np.sqrt(3 * 255 ** 2)
+
+def genre_similarity(affinity):
+    # Affinity in either direction; a genre is fully similar to itself
+    affinity = np.asarray(affinity, dtype=np.float64)
+    sim = np.maximum(affinity, affinity.T)
+    np.fill_diagonal(sim, 1)
+    return sim
+
+def _hamming(h, others):
+    x = np.bitwise_xor(others, h)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8)).reshape(len(x), 64).sum(axis=1)
+
+class CandidateSimilarity:
+    """
+    Similarity between n candidates as a weighted mean of features: small
+    precomputed tables looked up by ID (genre, color) and 64-bit perceptual
+    hashes (1 - Hamming distance / 64). A row is built on demand with
+    NumPy indexing, so MMR only pays O(n) per pick instead of an n x n matrix.
+    """
+    def __init__(self):
+        self.parts = []
+
+    def add_table(self, ids, table, weight):
+        self.parts.append((weight, np.asarray(ids), np.asarray(table, dtype=np.float64)))
+        return self
+
+    def add_hashes(self, hashes, weight):
+        # Candidates without a hash (None) are never image-similar to anything
+        known = np.array([h is not None for h in hashes])
+        values = np.array([h or 0 for h in hashes], dtype=np.uint64)
+        self.parts.append((weight, known, values))
+        return self
+
+    def row(self, i):
+        total = np.zeros(len(self.parts[0][1]))
+        for weight, ids, table in self.parts:
+            if table.dtype == np.uint64:
+                sim = 1 - _hamming(table[i], table) / 64
+                total += weight * np.where(ids & ids[i], sim, 0)
+            else:
+                total += weight * table[ids[i], ids]
+        return total / sum(weight for weight, _, _ in self.parts)
+
+# ==============================================================================
+# MMR RE-RANKING
+# ==============================================================================
+def mmr_select(relevance, similarity, k, lam=MMR_LAMBDA):
+    """
+    Indices of k candidates by greedy maximal marginal relevance: each pick
+    maximizes lam * relevance - (1 - lam) * (max similarity to the picks so
+    far). Relevance is scaled to [0, 1]; similarity(i) is candidate i's row.
+    One vectorized pass per pick, O(k * n); ties go to the earlier candidate.
+    """
+    relevance = np.asarray(relevance, dtype=np.float64)
+    if relevance.max(initial=0) > 0:
+        relevance = relevance / relevance.max()
+    closest = np.zeros(len(relevance))
+    gain = lam * relevance
+    picked = []
+    for _ in range(min(k, len(relevance))):
+        i = int(np.argmax(gain))
+        picked.append(i)
+        closest = np.maximum(closest, similarity(i))
+        gain = lam * relevance - (1 - lam) * closest
+        gain[picked] = -np.inf
+    return picked
+
+def rerank_images(candidates, k, dedup, lam=MMR_LAMBDA):
+    """
+    The k image candidates ({"path", "style", "color", "weight"}) to show:
+    high weight, but different styles, colors and images (dedup's hashes).
+    """
+    if not candidates:
+        return []
+    styles = {s: i for i, s in enumerate(dict.fromkeys(c["style"] for c in candidates))}
+    colors = {s: i for i, s in enumerate(dict.fromkeys(c["color"] for c in candidates))}
+    hashes = [dedup.hashes.get(c["path"], (None, None, None))[2] for c in candidates]
+    similarity = (
+        CandidateSimilarity()
+        .add_table([styles[c["style"]] for c in candidates], np.eye(len(styles)), 0.3)
+        .add_table([colors[c["color"]] for c in candidates], np.eye(len(colors)), 0.3)
+        .add_hashes(hashes, 0.4)
+    )
+    picked = mmr_select([c["weight"] for c in candidates], similarity.row, k, lam)
+    return [candidates[i] for i in picked]
+
+def pick_images(candidates, k, dedup, rng=random):
+    """
+    The k image candidates to show: a weighted random pool in which
+    near-duplicates of an image already drawn are skipped, re-ranked by MMR.
+    """
+    pool = weighted_sample(
+        candidates, [c["weight"] for c in candidates], max(MMR_POOL, k),
+        conflicts=lambda a, b: dedup.near(a["path"], b["path"]),
+        rng=rng
+    )
+    # Of the random pool, show the looks that differ most in style, color and image
+    return rerank_images(pool, k, dedup)
@@ -1,6 +1,10 @@
 import streamlit as st
 import random
-import os
+from diversity import pick_images
+from image_catalog import ImageCatalog
+from image_dedup import DuplicateIndex
+from image_view import show_image
+from sampling import session_rng
 
 # ==============================================================================
 # PAGE CONFIG
@@ -205,42 +209,17 @@ class StyleConfig:
 # ==============================================================================
 class ImageRecommender:
     @staticmethod
-    def recommend(gender, style_scores, color_scores, max_images=3, min_weight=12):
+    def recommend(gender, style_scores, color_scores, max_images=3, min_weight=12, rng=random):
         base_dir = "ai_images"
         gender_dir = "male" if gender == "male" else "female"
-
-        candidates = []
-
-        for style, s_score in style_scores.items():
-            for color, c_score in color_scores.items():
-                total_weight = s_score + c_score
-                if total_weight < min_weight:
-                    continue
-
-                path = os.path.join(base_dir, gender_dir, style, color)
-                if os.path.exists(path):
-                    for file in os.listdir(path):
-                        if file.lower().endswith((".png", ".jpg", ".jpeg")):
-                            candidates.append({
-                                "path": os.path.join(path, file),
-                                "style": style,
-                                "color": color,
-                                "weight": total_weight
-                            })
-
+        candidates = ImageCatalog.get(base_dir).candidates(
+            gender_dir, style_scores, color_scores, min_weight
+        )
         if not candidates:
             return []
 
-        selected = []
-        pool = candidates.copy()
-
-        while pool and len(selected) < max_images:
-            weights = [c["weight"] for c in pool]
-            choice = random.choices(pool, weights=weights, k=1)[0]
-            selected.append(choice)
-            pool.remove(choice)
-
-        return selected
+        # Near-duplicates of an image already drawn are skipped, so the looks differ visibly
+        return pick_images(candidates, max_images, DuplicateIndex.get(base_dir), rng)
 
 # ==============================================================================
 # SIDEBAR
@@ -288,15 +267,16 @@ def main():
             style_scores=style_scores,
             color_scores=color_scores,
             max_images=3,
-            min_weight=12
+            min_weight=12,
+            rng=session_rng(st.session_state, [gender, style_scores, color_scores])
         )
 
     if st.session_state["images"]:
         cols = st.columns(3)
 
-        for col, img in zip(cols, st.session_state["images"]):
+        for idx, (col, img) in enumerate(zip(cols, st.session_state["images"])):
             with col:
-                st.image(img["path"], use_container_width=True)
+                show_image(img, idx)
                 st.markdown(f"### {img['style']}")
                 st.caption(f"Color: {img['color']} | Total Weight: {img['weight']}")
 
@@ -1,6 +1,11 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw
+import numpy as np
+
+from diversity import CandidateSimilarity, color_similarity, mmr_select
+from image_encoding import cached_encode
+from sampling import session_rng
+from svg_draw import new_canvas
 
 st.set_page_config(page_title="Outfit Recommendation", layout="wide")
 st.title("Content-Based Outfit Recommendation")
@@ -115,25 +120,24 @@ OUTFIT_LIBRARY = {
 # 6. Outfit Generator
 # -----------------------------
 
-def generate_outfit(genre, color):
+def generate_outfit(genre, color, rng=random):
     parts = OUTFIT_LIBRARY[genre]
     return {
         "Genre": genre,
         "Color Theme": color,
-        "Inner": f"{color} {random.choice(parts['inner'])}",
-        "Outer": f"{color} {random.choice(parts['outer'])}",
-        "Bottom": f"{color} {random.choice(parts['bottom'])}"
+        "Inner": f"{color} {rng.choice(parts['inner'])}",
+        "Outer": f"{color} {rng.choice(parts['outer'])}",
+        "Bottom": f"{color} {rng.choice(parts['bottom'])}"
     }
 
 # -----------------------------
 # 7. Simple Image Generator
 # -----------------------------
 
-def generate_image(outfit):
+def generate_image(outfit, svg=None):
     base_color = COLOR_RGB[outfit["Color Theme"]]
 
-    img = Image.new("RGB", (260, 440), (255, 255, 255))
-    d = ImageDraw.Draw(img)
+    img, d = new_canvas((260, 440), (255, 255, 255), svg)
 
     # Head
     d.ellipse([100, 20, 160, 80], fill=(220, 200, 180))
@@ -157,34 +161,41 @@ def generate_image(outfit):
     bottom_color = tuple(max(0, c - 40) for c in base_color)
     d.rectangle([90, 260, 170, 400], fill=bottom_color, outline="black", width=3)
 
-    return img
+    return cached_encode(img)
 
 
 # -----------------------------
-# 8. Generate 3 Outfits (Color Duplication Avoidance)
+# 8. Generate 3 Outfits (Diversity Re-ranking)
 # -----------------------------
 
 st.header("👕 Recommended Outfits")
 
-used_colors = []
-
-for i, genre in enumerate(top_genres):
-
-    color = random.choice(top_colors)
-
-    # if duplicate color, try to change
-    if color in used_colors and len(top_colors) > 1:
-        color = random.choice([c for c in top_colors if c not in used_colors])
-
-    used_colors.append(color)
-
-    outfit = generate_outfit(genre, color)
+# Same session + same inputs + same rerun count -> same outfits
+rng = session_rng(st.session_state, [genre_scores, color_scores])
+
+# Every top genre x top color pairing is a candidate, shuffled so ties vary;
+# MMR keeps well-rated pairs that differ in genre and in color
+candidates = [(g, c) for g in top_genres for c in top_colors]
+rng.shuffle(candidates)
+similarity = (
+    CandidateSimilarity()
+    .add_table([GENRES.index(g) for g, _ in candidates], np.eye(len(GENRES)), 0.5)
+    .add_table(
+        [COLORS.index(c) for _, c in candidates],
+        color_similarity([COLOR_RGB[c] for c in COLORS]), 0.5
+    )
+)
+picks = mmr_select([genre_scores[g] + color_scores[c] for g, c in candidates], similarity.row, 3)
+
+for i, (genre, color) in enumerate(candidates[j] for j in picks):
+
+    outfit = generate_outfit(genre, color, rng)
     img = generate_image(outfit)
 
     col1, col2 = st.columns([1, 1.5])
 
     with col1:
-        st.image(img, caption=f"Outfit {i+1}")
+        st.image(img.data, output_format=img.format, caption=f"Outfit {i+1}")
 
     with col2:
         st.subheader(f"Outfit {i+1} Details")
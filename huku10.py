@@ -1,6 +1,10 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw
+
+from image_encoding import cached_encode
+from pattern_fill import fill_pattern
+from sampling import session_rng
+from svg_draw import new_canvas
 
 st.set_page_config(page_title="Outfit Recommendation", layout="wide")
 st.title("Content-Based Outfit Recommendation")
@@ -23,6 +27,7 @@ COLOR_RGB = {
     "Red": (160, 50, 50)
 }
 
+# Pattern tiles live in pattern_fill.PATTERN_TILES
 PATTERNS = ["None", "Stripe", "Dot", "Check"]
 
 # -----------------------------
@@ -66,37 +71,15 @@ OUTFIT_LIBRARY = {
 }
 
 # -----------------------------
-# 5. Pattern Drawer
-# -----------------------------
-
-def draw_pattern(d, area, pattern, base_color):
-    x1, y1, x2, y2 = area
-    if pattern == "Stripe":
-        for x in range(x1, x2, 8):
-            d.line([(x, y1), (x, y2)], fill=(255, 255, 255, 60), width=2)
-
-    elif pattern == "Dot":
-        for x in range(x1, x2, 12):
-            for y in range(y1, y2, 12):
-                d.ellipse([x, y, x+3, y+3], fill=(255, 255, 255))
-
-    elif pattern == "Check":
-        for x in range(x1, x2, 12):
-            d.line([(x, y1), (x, y2)], fill=(220, 220, 220), width=1)
-        for y in range(y1, y2, 12):
-            d.line([(x1, y), (x2, y)], fill=(220, 220, 220), width=1)
-
-# -----------------------------
-# 6. Image Generator
+# 5. Image Generator
 # -----------------------------
 
-def generate_image(color_name, gender):
+def generate_image(color_name, gender, rng=random, svg=None):
     base = COLOR_RGB[color_name]
-    inner_pattern = random.choice(PATTERNS)
-    outer_pattern = random.choice(PATTERNS)
+    inner_pattern = rng.choice(PATTERNS)
+    outer_pattern = rng.choice(PATTERNS)
 
-    img = Image.new("RGB", (260, 440), (245, 245, 245))
-    d = ImageDraw.Draw(img)
+    img, d = new_canvas((260, 440), (245, 245, 245), svg)
 
     skin = (220, 200, 180)
     inner = tuple(min(255, c + 30) for c in base)
@@ -121,7 +104,7 @@ def generate_image(color_name, gender):
     # Outer
     outer_area = (60, 100, 200, 270)
     d.rectangle(outer_area, fill=base, outline="black")
-    draw_pattern(d, outer_area, outer_pattern, base)
+    fill_pattern(img, outer_area, outer_pattern, base)
 
     # Zipper
     d.line([130, 100, 130, 270], fill=(200, 200, 200), width=2)
@@ -129,7 +112,7 @@ def generate_image(color_name, gender):
     # Inner
     inner_area = (95, 120, 165, 250)
     d.rectangle(inner_area, fill=inner, outline="black")
-    draw_pattern(d, inner_area, inner_pattern, inner)
+    fill_pattern(img, inner_area, inner_pattern, inner)
 
     # Logo
     d.rectangle([120, 170, 140, 190], fill=(255, 255, 255))
@@ -144,15 +127,18 @@ def generate_image(color_name, gender):
     d.rectangle([90, 400, 130, 420], fill=(40, 40, 40))
     d.rectangle([130, 400, 170, 420], fill=(40, 40, 40))
 
-    return img
+    return cached_encode(img)
 
 # -----------------------------
-# 7. Output
+# 6. Output
 # -----------------------------
 
 st.header("👕 Recommended Outfits")
 
+# Same session + same inputs + same rerun count -> same outfits
+rng = session_rng(st.session_state, [gender, genre_scores, color_scores])
+
 for i, genre in enumerate(top_genres):
-    color = random.choice(top_colors)
-    img = generate_image(color, gender)
-    st.image(img, caption=f"Outfit {i+1} | {genre} / {color}")
+    color = rng.choice(top_colors)
+    img = generate_image(color, gender, rng)
+    st.image(img.data, output_format=img.format, caption=f"Outfit {i+1} | {genre} / {color}")
@@ -1,6 +1,9 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw
+
+from image_encoding import cached_encode
+from sampling import session_rng
+from svg_draw import new_canvas
 
 st.set_page_config(page_title="Outfit Recommendation", layout="wide")
 st.title("Content-Based Outfit Recommendation")
@@ -115,25 +118,24 @@ OUTFIT_LIBRARY = {
 # 6. Outfit Generator
 # -----------------------------
 
-def generate_outfit(genre, color):
+def generate_outfit(genre, color, rng=random):
     parts = OUTFIT_LIBRARY[genre]
     return {
         "Genre": genre,
         "Color Theme": color,
-        "Inner": f"{color} {random.choice(parts['inner'])}",
-        "Outer": f"{color} {random.choice(parts['outer'])}",
-        "Bottom": f"{color} {random.choice(parts['bottom'])}"
+        "Inner": f"{color} {rng.choice(parts['inner'])}",
+        "Outer": f"{color} {rng.choice(parts['outer'])}",
+        "Bottom": f"{color} {rng.choice(parts['bottom'])}"
     }
 
 # -----------------------------
 # 7. Image Generator (Human Silhouette)
 # -----------------------------
 
-def generate_image(outfit):
+def generate_image(outfit, svg=None):
     base_color = COLOR_RGB[outfit["Color Theme"]]
 
-    img = Image.new("RGB", (260, 440), (245, 245, 245))
-    d = ImageDraw.Draw(img)
+    img, d = new_canvas((260, 440), (245, 245, 245), svg)
 
     # Colors
     skin = (220, 200, 180)
@@ -183,7 +185,7 @@ def generate_image(outfit):
     d.rectangle([90, 400, 130, 420], fill=(40, 40, 40))
     d.rectangle([130, 400, 170, 420], fill=(40, 40, 40))
 
-    return img
+    return cached_encode(img)
 
 # -----------------------------
 # 8. Generate 3 Outfits
@@ -191,23 +193,26 @@ def generate_image(outfit):
 
 st.header("👕 Recommended Outfits")
 
+# Same session + same inputs + same rerun count -> same outfits
+rng = session_rng(st.session_state, [genre_scores, color_scores])
+
 used_colors = []
 
 for i, genre in enumerate(top_genres):
-    color = random.choice(top_colors)
+    color = rng.choice(top_colors)
 
     if color in used_colors and len(top_colors) > 1:
-        color = random.choice([c for c in top_colors if c not in used_colors])
+        color = rng.choice([c for c in top_colors if c not in used_colors])
 
     used_colors.append(color)
 
-    outfit = generate_outfit(genre, color)
+    outfit = generate_outfit(genre, color, rng)
     img = generate_image(outfit)
 
     col1, col2 = st.columns([1, 1.5])
 
     with col1:
-        st.image(img, caption=f"Outfit {i+1}")
+        st.image(img.data, output_format=img.format, caption=f"Outfit {i+1}")
 
     with col2:
         st.subheader(f"Outfit {i+1} Details")
@@ -2,6 +2,8 @@ import streamlit as st
 import random
 import os
 
+from sampling import session_rng
+
 st.set_page_config(page_title="Outfit Recommendation", layout="wide")
 st.title("Content-Based Outfit Recommendation")
 
@@ -104,14 +106,14 @@ OUTFIT_LIBRARY = {
 # 6. Outfit Generator
 # -----------------------------
 
-def generate_outfit(genre, color):
+def generate_outfit(genre, color, rng=random):
     parts = OUTFIT_LIBRARY[genre]
     return {
         "Genre": genre,
         "Color Theme": color,
-        "Inner": f"{color} {random.choice(parts['inner'])}",
-        "Outer": f"{color} {random.choice(parts['outer'])}",
-        "Bottom": f"{color} {random.choice(parts['bottom'])}"
+        "Inner": f"{color} {rng.choice(parts['inner'])}",
+        "Outer": f"{color} {rng.choice(parts['outer'])}",
+        "Bottom": f"{color} {rng.choice(parts['bottom'])}"
     }
 
 # -----------------------------
@@ -133,17 +135,20 @@ def get_real_image_path(outfit):
 
 st.header("👕 Recommended Outfits")
 
+# Same session + same inputs + same rerun count -> same outfits
+rng = session_rng(st.session_state, [genre_scores, color_scores])
+
 used_colors = []
 
 for i, genre in enumerate(top_genres):
-    color = random.choice(top_colors)
+    color = rng.choice(top_colors)
 
     if color in used_colors and len(top_colors) > 1:
-        color = random.choice([c for c in top_colors if c not in used_colors])
+        color = rng.choice([c for c in top_colors if c not in used_colors])
 
     used_colors.append(color)
 
-    outfit = generate_outfit(genre, color)
+    outfit = generate_outfit(genre, color, rng)
     image_path = get_real_image_path(outfit)
 
     col1, col2 = st.columns([1.2, 1.5])
@@ -1,6 +1,9 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw
+
+from image_encoding import cached_encode
+from sampling import session_rng
+from svg_draw import new_canvas
 
 st.set_page_config(page_title="Outfit Recommendation", layout="wide")
 st.title("Content-Based Outfit Recommendation")
@@ -64,24 +67,23 @@ OUTFIT_LIBRARY = {
     "Formal": {"inner": ["Shirt"], "outer": ["Blazer"], "bottom": ["Slacks"]}
 }
 
-def generate_outfit(genre, color):
+def generate_outfit(genre, color, rng=random):
     p = OUTFIT_LIBRARY[genre]
     return {
         "Genre": genre,
         "Color Theme": color,
-        "Inner": f"{color} {random.choice(p['inner'])}",
-        "Outer": f"{color} {random.choice(p['outer'])}",
-        "Bottom": f"{color} {random.choice(p['bottom'])}"
+        "Inner": f"{color} {rng.choice(p['inner'])}",
+        "Outer": f"{color} {rng.choice(p['outer'])}",
+        "Bottom": f"{color} {rng.choice(p['bottom'])}"
     }
 
 # -----------------------------
 # 5. Gender-Aware Image Generator
 # -----------------------------
 
-def generate_image(outfit, gender):
+def generate_image(outfit, gender, svg=None):
     base = COLOR_RGB[outfit["Color Theme"]]
-    img = Image.new("RGB", (260, 440), (245, 245, 245))
-    d = ImageDraw.Draw(img)
+    img, d = new_canvas((260, 440), (245, 245, 245), svg)
 
     skin = (230, 200, 180)
 
@@ -120,7 +122,7 @@ def generate_image(outfit, gender):
     d.rectangle([90, 400, 130, 420], fill=(40, 40, 40))
     d.rectangle([130, 400, 170, 420], fill=(40, 40, 40))
 
-    return img
+    return cached_encode(img)
 
 # -----------------------------
 # 6. Display Results
@@ -128,13 +130,16 @@ def generate_image(outfit, gender):
 
 st.header("👕 Recommended Outfits")
 
+# Same session + same inputs + same rerun count -> same outfits
+rng = session_rng(st.session_state, [gender, genre_scores, color_scores])
+
 for i, g in enumerate(top_genres):
-    c = random.choice(top_colors)
-    outfit = generate_outfit(g, c)
+    c = rng.choice(top_colors)
+    outfit = generate_outfit(g, c, rng)
     img = generate_image(outfit, gender)
 
     col1, col2 = st.columns([1, 1.5])
     with col1:
-        st.image(img, caption=f"{gender} Outfit {i+1}")
+        st.image(img.data, output_format=img.format, caption=f"{gender} Outfit {i+1}")
     with col2:
         st.write(outfit)
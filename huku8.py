@@ -1,6 +1,9 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw
+
+from image_encoding import cached_encode
+from sampling import session_rng
+from svg_draw import new_canvas
 
 st.set_page_config(page_title="Outfit Recommendation", layout="wide")
 st.title("Content-Based Outfit Recommendation")
@@ -76,14 +79,14 @@ def get_outfit_parts(gender, genre):
 # 5. Outfit Generator
 # -----------------------------
 
-def generate_outfit(genre, color):
+def generate_outfit(genre, color, rng=random):
     parts = get_outfit_parts(gender, genre)
     return {
         "Genre": genre,
         "Color": color,
-        "Inner": f"{color} {random.choice(parts['inner'])}",
-        "Outer": f"{color} {random.choice(parts['outer'])}",
-        "Bottom": f"{color} {random.choice(parts['bottom'])}"
+        "Inner": f"{color} {rng.choice(parts['inner'])}",
+        "Outer": f"{color} {rng.choice(parts['outer'])}",
+        "Bottom": f"{color} {rng.choice(parts['bottom'])}"
     }
 
 # -----------------------------
@@ -97,12 +100,11 @@ def safe_color(c):
 # 7. Image Generator
 # -----------------------------
 
-def generate_image(outfit, gender):
+def generate_image(outfit, gender, svg=None):
     base = safe_color(COLOR_RGB[outfit["Color"]])
     darker = safe_color((base[0]-40, base[1]-40, base[2]-40))
 
-    img = Image.new("RGB", (260, 440), (245, 245, 245))
-    d = ImageDraw.Draw(img)
+    img, d = new_canvas((260, 440), (245, 245, 245), svg)
 
     skin = (230, 200, 180)
     hair = (60, 40, 25)
@@ -152,7 +154,7 @@ def generate_image(outfit, gender):
     d.rectangle([90, 400, 130, 420], fill=(40, 40, 40))
     d.rectangle([130, 400, 170, 420], fill=(40, 40, 40))
 
-    return img
+    return cached_encode(img)
 
 # -----------------------------
 # 8. Display Results
@@ -160,14 +162,17 @@ def generate_image(outfit, gender):
 
 st.header("👕 Recommended Outfits")
 
+# Same session + same inputs + same rerun count -> same outfits
+rng = session_rng(st.session_state, [gender, genre_scores, color_scores])
+
 for i, genre in enumerate(top_genres):
-    color = random.choice(top_colors)
-    outfit = generate_outfit(genre, color)
+    color = rng.choice(top_colors)
+    outfit = generate_outfit(genre, color, rng)
     img = generate_image(outfit, gender)
 
     col1, col2 = st.columns([1, 1.5])
     with col1:
-        st.image(img, caption=f"Outfit {i+1}")
+        st.image(img.data, output_format=img.format, caption=f"Outfit {i+1}")
     with col2:
         st.subheader(f"Outfit {i+1}")
         st.write(f"**Gender:** {gender}")
@@ -0,0 +1,564 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import struct
+import threading
+import time
+
+from result_cache import encode_scores, get_cache
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+MANIFEST_NAME = ".catalog.json"
+MANIFEST_VERSION = 2
+# Display renditions live in <color>/.renditions/<file>.w<width>.<ext>
+RENDITION_DIR = ".renditions"
+RENDITION_NAME = re.compile(r"^(?P<original>.+)\.w(?P<width>\d+)\.[^.]+$")
+# Width the 3-column recommender UIs request (~2x device pixel ratio)
+DISPLAY_WIDTH = 640
+# Fallback watcher: seconds between directory mtime scans
+POLL_INTERVAL = 2.0
+
+# ==============================================================================
+# CATALOG INDEX
+# ==============================================================================
+class ImageCatalog:
+    """
+    In-memory index of the ai_images/<gender>/<style>/<color>/ tree.
+    The scan result is saved as a manifest and reused across restarts until
+    one of the directory mtimes changes.
+    """
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, base_dir, cells, dir_mtimes, renditions=None, generation=0):
+        self.base_dir = base_dir
+        # Bumped by every watcher update; lets result caches key on the snapshot
+        self.generation = generation
+        # {(gender, style, color): [path, ...]}
+        self.cells = cells
+        # {original path: {width: rendition path}}
+        self.renditions = renditions or {}
+        # {"gender/style/color": mtime_ns} for every directory below base_dir
+        self.dir_mtimes = dir_mtimes
+        self._reindex()
+
+    def _reindex(self):
+        # Image IDs are contiguous per cell: paths[start:end] is one cell
+        self.paths = []
+        # {(gender, style, color): (start, end)} for non-empty cells only
+        self.cell_ranges = {}
+        for key in sorted(self.cells):
+            start = len(self.paths)
+            self.paths.extend(self.cells[key])
+            self.cell_ranges[key] = (start, len(self.paths))
+
+    # --- Process-wide access -------------------------------------------------
+    @classmethod
+    def get(cls, base_dir="ai_images", watch=True):
+        # Streamlit re-runs the app script, not imported modules, so this
+        # instance survives across reruns and sessions. The watcher swaps in
+        # a new snapshot whenever files change; callers keep the one they got.
+        with cls._lock:
+            catalog = cls._instances.get(base_dir)
+            if catalog is None:
+                catalog = cls.load(base_dir)
+                cls._instances[base_dir] = catalog
+                if watch:
+                    CatalogWatcher(base_dir).start()
+            return catalog
+
+    @classmethod
+    def publish(cls, base_dir, update):
+        # Atomically replace the shared snapshot with update(current)
+        with cls._lock:
+            current = cls._instances.get(base_dir)
+            if current is None:
+                return None
+            catalog = update(current)
+            if catalog is current:
+                # Nothing changed: don't rewrite the manifest on every poll
+                return catalog
+            cls._instances[base_dir] = catalog
+        catalog.save(os.path.join(base_dir, MANIFEST_NAME))
+        return catalog
+
+    @classmethod
+    def load(cls, base_dir, manifest_path=None):
+        manifest_path = manifest_path or os.path.join(base_dir, MANIFEST_NAME)
+        catalog = cls.read_manifest(base_dir, manifest_path)
+        if catalog is None or catalog.is_stale():
+            catalog = cls.build(base_dir)
+            catalog.save(manifest_path)
+        return catalog
+
+    # --- Query ---------------------------------------------------------------
+    def images(self, gender, style, color):
+        return self.cells.get((gender, style, color), [])
+
+    def count(self, gender, style, color):
+        start, end = self.cell_ranges.get((gender, style, color), (0, 0))
+        return end - start
+
+    def match(self, gender, style_scores, color_scores, min_weight):
+        """
+        (style, color, style_score, color_score, start, end) for every
+        non-empty cell with style_score + color_score >= min_weight.
+        Scores are visited in descending order so a row stops as soon as
+        the threshold can no longer be met, and the remaining rows are
+        skipped once even the best color cannot lift them over it.
+        """
+        styles = sorted(style_scores.items(), key=lambda kv: kv[1], reverse=True)
+        colors = sorted(color_scores.items(), key=lambda kv: kv[1], reverse=True)
+        if not colors:
+            return []
+        best_color = colors[0][1]
+
+        matches = []
+        for style, s_score in styles:
+            if s_score + best_color < min_weight:
+                break
+            for color, c_score in colors:
+                if s_score + c_score < min_weight:
+                    break
+                cell = self.cell_ranges.get((gender, style, color))
+                if cell:
+                    matches.append((style, color, s_score, c_score) + cell)
+        return matches
+
+    def candidates(self, gender, style_scores, color_scores, min_weight):
+        """
+        One {"path", "style", "color", "weight", "style_score", "color_score"}
+        dict per image in the cells that match(). They depend only on this
+        snapshot and the slider values, so repeated settings are an LRU hit.
+        """
+        cache = get_cache("image_candidates", maxsize=512, ttl=600)
+        key = (
+            self.base_dir, self.generation, gender,
+            encode_scores(style_scores), encode_scores(color_scores), min_weight
+        )
+        candidates = cache.get(key)
+        if candidates is None:
+            candidates = []
+            for style, color, s_score, c_score, start, end in self.match(
+                gender, style_scores, color_scores, min_weight
+            ):
+                for path in self.paths[start:end]:
+                    candidates.append({
+                        "path": path,
+                        "style": style,
+                        "color": color,
+                        "weight": s_score + c_score,
+                        "style_score": s_score,
+                        "color_score": c_score
+                    })
+            cache.put(key, candidates)
+        return candidates
+
+    def rendition(self, path, width):
+        # Smallest rendition at least `width` px wide, else the original file
+        fits = [w for w in self.renditions.get(path, {}) if w >= width]
+        return self.renditions[path][min(fits)] if fits else path
+
+    # --- Scan ----------------------------------------------------------------
+    @staticmethod
+    def _subdirs(path):
+        try:
+            with os.scandir(path) as it:
+                return [e for e in it if e.is_dir() and not e.name.startswith(".")]
+        except OSError:
+            return []
+
+    @staticmethod
+    def _index_renditions(cell_dir, names, renditions):
+        # "<file>.w<width>.<ext>" -> renditions[<cell_dir>/<file>][width]
+        rendition_dir = os.path.join(cell_dir, RENDITION_DIR)
+        for name in names:
+            m = RENDITION_NAME.match(name)
+            if m:
+                renditions.setdefault(os.path.join(cell_dir, m["original"]), {})[int(m["width"])] = (
+                    os.path.join(rendition_dir, name)
+                )
+
+    @staticmethod
+    def _list_renditions(cell_dir):
+        try:
+            return sorted(os.listdir(os.path.join(cell_dir, RENDITION_DIR)))
+        except OSError:
+            return []
+
+    @classmethod
+    def _walk_cells(cls, base_dir, mtimes):
+        # Yields (gender, style, color, path) and records every directory mtime
+        for g in cls._subdirs(base_dir):
+            mtimes[g.name] = g.stat().st_mtime_ns
+            for s in cls._subdirs(g.path):
+                mtimes[f"{g.name}/{s.name}"] = s.stat().st_mtime_ns
+                for c in cls._subdirs(s.path):
+                    key = f"{g.name}/{s.name}/{c.name}"
+                    mtimes[key] = c.stat().st_mtime_ns
+                    try:
+                        mtimes[f"{key}/{RENDITION_DIR}"] = os.stat(
+                            os.path.join(c.path, RENDITION_DIR)
+                        ).st_mtime_ns
+                    except OSError:
+                        pass
+                    yield g.name, s.name, c.name, c.path
+
+    @classmethod
+    def scan_dir_mtimes(cls, base_dir):
+        mtimes = {}
+        for _ in cls._walk_cells(base_dir, mtimes):
+            pass
+        return mtimes
+
+    @classmethod
+    def build(cls, base_dir):
+        cells = {}
+        dir_mtimes = {}
+        renditions = {}
+        for gender, style, color, cell_dir in cls._walk_cells(base_dir, dir_mtimes):
+            files = sorted(
+                f for f in os.listdir(cell_dir)
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if files:
+                cells[(gender, style, color)] = [os.path.join(cell_dir, f) for f in files]
+                cls._index_renditions(cell_dir, cls._list_renditions(cell_dir), renditions)
+        return cls(base_dir, cells, dir_mtimes, renditions)
+
+    # --- Deltas --------------------------------------------------------------
+    def with_changes(self, changes, dir_mtimes=None):
+        """
+        New catalog with (op, gender, style, color, name) deltas applied.
+        op is "add"/"remove" for originals and "add_rendition"/
+        "remove_rendition" for files under .renditions. This instance is
+        left untouched so concurrent readers see a consistent snapshot.
+        """
+        cells = dict(self.cells)
+        renditions = dict(self.renditions)
+        touched = set()
+        for op, gender, style, color, name in changes:
+            key = (gender, style, color)
+            cell_dir = os.path.join(self.base_dir, gender, style, color)
+            touched.add(key)
+
+            if op in ("add", "remove"):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(cell_dir, name)
+                files = [p for p in cells.get(key, []) if p != path]
+                if op == "add":
+                    files.append(path)
+                    files.sort()
+                if files:
+                    cells[key] = files
+                else:
+                    cells.pop(key, None)
+            else:
+                m = RENDITION_NAME.match(name)
+                if not m:
+                    continue
+                original = os.path.join(cell_dir, m["original"])
+                sizes = dict(renditions.get(original, {}))
+                if op == "add_rendition":
+                    sizes[int(m["width"])] = os.path.join(cell_dir, RENDITION_DIR, name)
+                else:
+                    sizes.pop(int(m["width"]), None)
+                if sizes:
+                    renditions[original] = sizes
+                else:
+                    renditions.pop(original, None)
+
+        if dir_mtimes is None:
+            # Re-stat only the directories the deltas touched
+            dir_mtimes = dict(self.dir_mtimes)
+            for gender, style, color in touched:
+                for rel in (
+                    gender,
+                    f"{gender}/{style}",
+                    f"{gender}/{style}/{color}",
+                    f"{gender}/{style}/{color}/{RENDITION_DIR}"
+                ):
+                    try:
+                        dir_mtimes[rel] = os.stat(os.path.join(self.base_dir, rel)).st_mtime_ns
+                    except OSError:
+                        dir_mtimes.pop(rel, None)
+        return ImageCatalog(self.base_dir, cells, dir_mtimes, renditions, self.generation + 1)
+
+    def cell_changes(self, gender, style, color):
+        # Deltas that bring one cell in line with what is on disk right now
+        cell_dir = os.path.join(self.base_dir, gender, style, color)
+        try:
+            names = {f for f in os.listdir(cell_dir) if f.lower().endswith(IMAGE_EXTENSIONS)}
+        except OSError:
+            names = set()
+        known = self.images(gender, style, color)
+        known_names = {os.path.basename(p) for p in known}
+        rendition_names = set(self._list_renditions(cell_dir))
+        known_renditions = {
+            os.path.basename(r) for p in known for r in self.renditions.get(p, {}).values()
+        }
+
+        changes = [("add", gender, style, color, n) for n in sorted(names - known_names)]
+        changes += [("remove", gender, style, color, n) for n in sorted(known_names - names)]
+        changes += [
+            ("add_rendition", gender, style, color, n)
+            for n in sorted(rendition_names - known_renditions)
+        ]
+        changes += [
+            ("remove_rendition", gender, style, color, n)
+            for n in sorted(known_renditions - rendition_names)
+        ]
+        return changes
+
+    def is_stale(self):
+        return self.scan_dir_mtimes(self.base_dir) != self.dir_mtimes
+
+    # --- Manifest ------------------------------------------------------------
+    def save(self, manifest_path):
+        data = {
+            "version": MANIFEST_VERSION,
+            "dirs": self.dir_mtimes,
+            "cells": {
+                "/".join(key): [os.path.basename(p) for p in paths]
+                for key, paths in self.cells.items()
+            },
+            "renditions": {
+                "/".join(key): [
+                    os.path.basename(r)
+                    for p in paths
+                    for r in self.renditions.get(p, {}).values()
+                ]
+                for key, paths in self.cells.items()
+            }
+        }
+        # Every worker process saves the same manifest: each writes its own
+        # temp file, so one can't truncate another's before the replace
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, manifest_path)
+        except OSError:
+            # Read-only image volume: keep serving from memory
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    @classmethod
+    def read_manifest(cls, base_dir, manifest_path):
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+
+        cells = {}
+        renditions = {}
+        for key, files in data["cells"].items():
+            gender, style, color = key.split("/")
+            cell_dir = os.path.join(base_dir, gender, style, color)
+            cells[(gender, style, color)] = [os.path.join(cell_dir, f) for f in files]
+            cls._index_renditions(cell_dir, data["renditions"].get(key, []), renditions)
+        return cls(base_dir, cells, data["dirs"], renditions)
+
+# ==============================================================================
+# CATALOG WATCHER
+# ==============================================================================
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+class CatalogWatcher:
+    """
+    Background thread that keeps ImageCatalog.get(base_dir) in sync with the
+    image tree. Uses inotify where available and falls back to polling the
+    directory mtimes every POLL_INTERVAL seconds. Changes are applied as
+    per-file deltas, never as a full rescan.
+    """
+    _running = set()
+    _running_lock = threading.Lock()
+
+    def __init__(self, base_dir, poll_interval=POLL_INTERVAL, batch_window=0.2):
+        self.base_dir = base_dir
+        self.poll_interval = poll_interval
+        self.batch_window = batch_window
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._running_lock:
+            if self.base_dir in self._running:
+                return self
+            self._running.add(self.base_dir)
+        self._thread = threading.Thread(
+            target=self._run, name=f"catalog-watcher:{self.base_dir}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        with self._running_lock:
+            self._running.discard(self.base_dir)
+
+    def _run(self):
+        try:
+            fd = self._inotify_init()
+        except OSError:
+            fd = None
+        if fd is None:
+            self._poll_loop()
+        else:
+            try:
+                self._inotify_loop(fd)
+            finally:
+                os.close(fd)
+
+    # --- Polling fallback ----------------------------------------------------
+    def resync(self):
+        # Diff directory mtimes against the snapshot, relist changed cells only
+        mtimes = ImageCatalog.scan_dir_mtimes(self.base_dir)
+
+        def update(catalog):
+            changed = set()
+            for rel in set(mtimes) | set(catalog.dir_mtimes):
+                parts = rel.split("/")
+                # Vanished gender/style directories also drop their cell keys
+                if len(parts) >= 3 and mtimes.get(rel) != catalog.dir_mtimes.get(rel):
+                    changed.add(tuple(parts[:3]))
+            changes = []
+            for key in sorted(changed):
+                changes.extend(catalog.cell_changes(*key))
+            if not changes and mtimes == catalog.dir_mtimes:
+                return catalog
+            return catalog.with_changes(changes, dir_mtimes=mtimes)
+
+        ImageCatalog.publish(self.base_dir, update)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self.resync()
+
+    # --- inotify backend -----------------------------------------------------
+    def _inotify_init(self):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            return None
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            return None
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._libc = libc
+        return fd
+
+    def _add_watch(self, fd, rel):
+        path = os.path.join(self.base_dir, rel) if rel else self.base_dir
+        wd = self._libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = rel
+
+    def _drop_tree(self, fd, rel):
+        # Forget watches under a directory that was moved away or deleted
+        for wd, watched in list(self._watches.items()):
+            if watched == rel or watched.startswith(rel + "/"):
+                self._libc.inotify_rm_watch(fd, wd)
+                del self._watches[wd]
+
+    def _add_tree(self, fd, rel):
+        # Watch rel and every directory below it down to .renditions
+        self._add_watch(fd, rel)
+        depth = len(rel.split("/")) if rel else 0
+        if depth > 3:
+            return
+        path = os.path.join(self.base_dir, rel) if rel else self.base_dir
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return
+        for name in names:
+            hidden = name.startswith(".") and not (depth == 3 and name == RENDITION_DIR)
+            if not hidden and os.path.isdir(os.path.join(path, name)):
+                self._add_tree(fd, f"{rel}/{name}" if rel else name)
+
+    def _inotify_loop(self, fd):
+        self._watches = {}
+        self._add_tree(fd, "")
+        # Catch anything that changed between the initial load and the watches
+        self.resync()
+
+        while not self._stop.is_set():
+            readable, _, _ = select.select([fd], [], [], self.poll_interval)
+            if not readable:
+                continue
+            # Let bursts (e.g. a batch copy) settle into one snapshot update
+            time.sleep(self.batch_window)
+            changes, rescan = self._read_events(fd)
+            if rescan:
+                self.resync()
+            if changes:
+                ImageCatalog.publish(self.base_dir, lambda c: c.with_changes(changes))
+
+    def _read_events(self, fd):
+        changes = []
+        rescan = False
+        data = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            rel = self._watches.get(wd)
+            if rel is None or not name:
+                continue
+            parts = rel.split("/") if rel else []
+            child = f"{rel}/{name}" if rel else name
+
+            if mask & IN_ISDIR:
+                if name.startswith(".") and not (len(parts) == 3 and name == RENDITION_DIR):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(fd, child)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._drop_tree(fd, child)
+                # New or vanished directories: relist the cells under them
+                rescan = True
+                continue
+            if name.startswith(".") or len(parts) < 3:
+                continue
+
+            gender, style, color = parts[:3]
+            rendition = len(parts) == 4 and parts[3] == RENDITION_DIR
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                op = "add"
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                op = "remove"
+            else:
+                continue
+            changes.append((op + "_rendition" if rendition else op, gender, style, color, name))
+        return changes, rescan
@@ -0,0 +1,197 @@
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from image_catalog import ImageCatalog
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+HASH_FILE = ".phash.json"
+HASH_VERSION = 1
+# Max Hamming distance (of 64 bits) for two images to count as near-duplicates
+DUPLICATE_DISTANCE = 6
+
+# ==============================================================================
+# PERCEPTUAL HASH
+# ==============================================================================
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+_DCT32 = _dct_matrix(32)
+
+def phash(path):
+    """64-bit DCT perceptual hash: sign of the 8x8 low frequencies vs their median."""
+    with Image.open(path) as img:
+        small = img.convert("L").resize((32, 32), resample=Image.BILINEAR, reducing_gap=2.0)
+    px = np.asarray(small, dtype=np.float64)
+    low = (_DCT32 @ px @ _DCT32.T)[:8, :8].ravel()
+    bits = low > np.median(low)
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+def _hash_job(path):
+    try:
+        return path, phash(path)
+    except OSError:
+        return path, None
+
+# ==============================================================================
+# BK-TREE (Hamming distance)
+# ==============================================================================
+class BKTree:
+    def __init__(self):
+        # node = [hash, payload, {distance: child node}]
+        self.root = None
+
+    def add(self, h, payload):
+        node = [h, payload, {}]
+        if self.root is None:
+            self.root = node
+            return
+        cur = self.root
+        while True:
+            d = bin(cur[0] ^ h).count("1")
+            child = cur[2].get(d)
+            if child is None:
+                cur[2][d] = node
+                return
+            cur = child
+
+    def query(self, h, radius):
+        # Payloads of every stored hash within `radius` bits of h
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            cur = stack.pop()
+            d = bin(cur[0] ^ h).count("1")
+            if d <= radius:
+                found.append(cur[1])
+            for dist, child in cur[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return found
+
+# ==============================================================================
+# DUPLICATE INDEX
+# ==============================================================================
+class DuplicateIndex:
+    """
+    Perceptual hashes for every catalog image and near-duplicate lookups.
+    Near-duplicates are pairs within max_distance bits, not groups: the
+    relation is not transitive, so chaining A~B~C must not make A and C
+    duplicates. Hashes are cached in <base_dir>/.phash.json keyed by (mtime, size), so a
+    refresh only hashes new or modified files.
+    """
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, base_dir, hashes, max_distance=DUPLICATE_DISTANCE):
+        self.base_dir = base_dir
+        # {path: (mtime_ns, size, hash)}
+        self.hashes = hashes
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        for path in sorted(hashes):
+            self.tree.add(hashes[path][2], path)
+
+    @classmethod
+    def get(cls, base_dir="ai_images"):
+        # Serving only reads the cached hashes; `python image_dedup.py` fills them
+        with cls._lock:
+            index = cls._instances.get(base_dir)
+            if index is None:
+                index = cls.load(base_dir)
+                cls._instances[base_dir] = index
+            return index
+
+    @classmethod
+    def load(cls, base_dir):
+        try:
+            with open(os.path.join(base_dir, HASH_FILE), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(base_dir, {})
+        if data.get("version") != HASH_VERSION:
+            return cls(base_dir, {})
+        hashes = {
+            os.path.join(base_dir, rel): (mtime, size, int(h, 16))
+            for rel, (mtime, size, h) in data["hashes"].items()
+        }
+        return cls(base_dir, hashes)
+
+    def save(self):
+        data = {
+            "version": HASH_VERSION,
+            "hashes": {
+                os.path.relpath(path, self.base_dir): [mtime, size, f"{h:016x}"]
+                for path, (mtime, size, h) in self.hashes.items()
+            }
+        }
+        tmp_path = os.path.join(self.base_dir, HASH_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.base_dir, HASH_FILE))
+
+    def refresh(self, catalog, workers=None):
+        """Hash new/changed catalog images in a process pool; drop removed ones."""
+        hashes = {}
+        todo = []
+        for path in catalog.paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            cached = self.hashes.get(path)
+            if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                hashes[path] = cached
+            else:
+                hashes[path] = (st.st_mtime_ns, st.st_size, None)
+                todo.append(path)
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for path, h in pool.map(_hash_job, todo, chunksize=8):
+                    if h is None:
+                        del hashes[path]
+                    else:
+                        hashes[path] = hashes[path][:2] + (h,)
+
+        refreshed = DuplicateIndex(self.base_dir, hashes, self.max_distance)
+        return refreshed, len(todo)
+
+    def distance(self, a, b):
+        # None when either image has no hash yet
+        ha, hb = self.hashes.get(a), self.hashes.get(b)
+        if ha is None or hb is None:
+            return None
+        return bin(ha[2] ^ hb[2]).count("1")
+
+    def near(self, a, b):
+        """True if a and b are (distinct) near-duplicates of each other."""
+        d = self.distance(a, b)
+        return a != b and d is not None and d <= self.max_distance
+
+    def duplicate_pairs(self):
+        pairs = []
+        for path, (_, _, h) in self.hashes.items():
+            for other in self.tree.query(h, self.max_distance):
+                if path < other:
+                    pairs.append((path, other, self.distance(path, other)))
+        return sorted(pairs)
+
+if __name__ == "__main__":
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "ai_images"
+    index, hashed = DuplicateIndex.load(base_dir).refresh(ImageCatalog.load(base_dir))
+    index.save()
+    print(f"{hashed} images hashed, {len(index.hashes)} total")
+    for a, b, d in index.duplicate_pairs():
+        print(f"near-duplicates ({d} bits): {a} ~ {b}")
@@ -0,0 +1,64 @@
+import hashlib
+import io
+import time
+
+from result_cache import get_cache
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+# st.image forwards PNG/JPEG bytes untouched only when output_format names
+# their format; anything else (WebP included) is decoded and re-encoded on
+# every call, so PNG is the format to cache
+ENCODE_FORMAT = "PNG"
+ENCODE_CACHE_SIZE = 256
+
+# ==============================================================================
+# ENCODED IMAGE
+# ==============================================================================
+class EncodedImage:
+    """
+    Encoded image bytes, their content hash and what the encode cost.
+    SVG output keeps data as a str, which is what st.image expects for SVG.
+    """
+    def __init__(self, data, format, encode_ms):
+        self.data = data
+        self.format = format
+        self.encode_ms = encode_ms
+        raw = data.encode("utf-8") if isinstance(data, str) else data
+        self.digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        self.size = len(raw)
+
+def encode_image(img, format=ENCODE_FORMAT):
+    # Vector canvases (svg_draw.SvgDraw) serialize themselves
+    if hasattr(img, "to_svg"):
+        return img.encode()
+    start = time.perf_counter()
+    buf = io.BytesIO()
+    if format == "PNG":
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        img.save(buf, format=format)
+    return EncodedImage(buf.getvalue(), format, (time.perf_counter() - start) * 1000)
+
+# ==============================================================================
+# CACHED ENCODES
+# ==============================================================================
+def cached_render(key, render, format=ENCODE_FORMAT):
+    """
+    Encoded output of render() for a key that determines the image: a hit
+    skips both drawing and encoding.
+    """
+    cache = get_cache("encoded_images", maxsize=ENCODE_CACHE_SIZE)
+    return cache.get_or_compute((format, key), lambda: encode_image(render(), format))
+
+def cached_encode(img, format=ENCODE_FORMAT):
+    # SVG text is cheaper to rebuild than to hash and cache
+    if hasattr(img, "to_svg"):
+        return encode_image(img)
+    # For renderers without a natural key: hashing the pixels is far cheaper
+    # than encoding them, and identical pixels always encode to identical bytes
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.mode}:{img.size}".encode("ascii"))
+    h.update(img.tobytes())
+    return cached_render(("pixels", h.hexdigest()), lambda: img, format)
@@ -0,0 +1,125 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+from image_catalog import ImageCatalog
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+PACK_DIR = ".pack"
+PACK_NAME = "renditions.pack"
+PACK_VERSION = 2
+# Pack layout: blobs | index JSON | trailer (magic, version, index length)
+PACK_TRAILER = struct.Struct("<4sIQ")
+PACK_MAGIC = b"RPAK"
+
+# ==============================================================================
+# BUILD
+# ==============================================================================
+def build_pack(catalog):
+    """
+    Concatenate every pre-encoded rendition in the catalog into one file,
+    followed by its {path: [offset, length]} index. Blobs and index are
+    swapped in by a single atomic replace, so a reader can never pair one
+    build's offsets with another's bytes, and processes that still map the
+    old pack keep working.
+    """
+    pack_dir = os.path.join(catalog.base_dir, PACK_DIR)
+    os.makedirs(pack_dir, exist_ok=True)
+    pack_path = os.path.join(pack_dir, PACK_NAME)
+
+    entries = {}
+    offset = 0
+    with open(pack_path + ".tmp", "wb") as out:
+        for path in catalog.paths:
+            for rendition in sorted(catalog.renditions.get(path, {}).values()):
+                try:
+                    with open(rendition, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                out.write(data)
+                entries[os.path.relpath(rendition, catalog.base_dir)] = [offset, len(data)]
+                offset += len(data)
+        index = json.dumps({"entries": entries}, ensure_ascii=False).encode("utf-8")
+        out.write(index)
+        out.write(PACK_TRAILER.pack(PACK_MAGIC, PACK_VERSION, len(index)))
+
+    os.replace(pack_path + ".tmp", pack_path)
+    return len(entries), offset
+
+# ==============================================================================
+# PACKED STORE
+# ==============================================================================
+class PackedStore:
+    """
+    Read-only, memory-mapped view of the rendition pack. Every worker maps
+    the same file, so popular images live once in the page cache and a
+    lookup is a dict hit plus a memoryview slice (no open/read, no copy).
+    """
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, base_dir, entries, buffer=None):
+        self.base_dir = base_dir
+        # {path: (offset, length)}
+        self.entries = entries
+        self._buffer = buffer
+
+    @classmethod
+    def get(cls, base_dir="ai_images"):
+        with cls._lock:
+            store = cls._instances.get(base_dir)
+            if store is None:
+                store = cls.open(base_dir)
+                cls._instances[base_dir] = store
+            return store
+
+    @classmethod
+    def open(cls, base_dir):
+        # Missing, unreadable or old-format pack: an empty store, callers fall back to files
+        try:
+            with open(os.path.join(base_dir, PACK_DIR, PACK_NAME), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return cls(base_dir, {})
+
+        # Index and trailer come from the same mapping as the blobs
+        if len(mm) < PACK_TRAILER.size:
+            return cls(base_dir, {})
+        magic, version, index_len = PACK_TRAILER.unpack_from(mm, len(mm) - PACK_TRAILER.size)
+        blobs_end = len(mm) - PACK_TRAILER.size - index_len
+        if magic != PACK_MAGIC or version != PACK_VERSION or blobs_end < 0:
+            return cls(base_dir, {})
+        try:
+            data = json.loads(mm[blobs_end:blobs_end + index_len].decode("utf-8"))
+        except ValueError:
+            return cls(base_dir, {})
+
+        entries = {
+            os.path.join(base_dir, rel): (offset, length)
+            for rel, (offset, length) in data["entries"].items()
+            if offset + length <= blobs_end
+        }
+        return cls(base_dir, entries, memoryview(mm))
+
+    def view(self, path):
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._buffer[offset:offset + length]
+
+    def image_source(self, path):
+        # st.image accepts bytes but not memoryview, so this is the single copy
+        packed = self.view(path)
+        return path if packed is None else packed.tobytes()
+
+if __name__ == "__main__":
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "ai_images"
+    count, size = build_pack(ImageCatalog.load(base_dir))
+    print(f"{count} renditions packed, {size} bytes")
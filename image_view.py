@@ -0,0 +1,22 @@
+import streamlit as st
+
+from image_catalog import DISPLAY_WIDTH, ImageCatalog
+from image_store import PackedStore
+
+# ==============================================================================
+# RECOMMENDED IMAGE
+# ==============================================================================
+def show_image(img, slot, base_dir="ai_images"):
+    """
+    A recommended image in the current column: the column-sized rendition
+    from the pack by default, the original when its "Full resolution"
+    toggle is on. slot (the column index) is part of the widget key, since
+    one image can be drawn into several columns.
+    """
+    full_key = f"full_{slot}_{img['path']}"
+    if st.session_state.get(full_key, False):
+        st.image(img["path"], use_container_width=True)
+    else:
+        rendition = ImageCatalog.get(base_dir).rendition(img["path"], DISPLAY_WIDTH)
+        st.image(PackedStore.get(base_dir).image_source(rendition), use_container_width=True)
+    st.toggle("Full resolution", key=full_key)
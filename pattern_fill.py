@@ -0,0 +1,78 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from result_cache import get_cache
+
+# ==============================================================================
+# PATTERN REGISTRY
+# ==============================================================================
+# {name: (tile size, painter)}; a painter draws one period of the pattern
+# onto a transparent RGBA tile of that size
+PATTERN_TILES = {}
+
+def register_pattern(name, size):
+    def wrap(painter):
+        PATTERN_TILES[name] = (size, painter)
+        return painter
+    return wrap
+
+@register_pattern("Stripe", (8, 1))
+def _stripe(d, base_color):
+    # 2px vertical line every 8px
+    d.rectangle([0, 0, 1, 0], fill=(255, 255, 255))
+
+@register_pattern("Dot", (12, 12))
+def _dot(d, base_color):
+    d.ellipse([0, 0, 3, 3], fill=(255, 255, 255))
+
+@register_pattern("Check", (12, 12))
+def _check(d, base_color):
+    d.line([(0, 0), (0, 11)], fill=(220, 220, 220), width=1)
+    d.line([(0, 0), (11, 0)], fill=(220, 220, 220), width=1)
+
+# ==============================================================================
+# TILES & FILL
+# ==============================================================================
+def pattern_tile(pattern, base_color):
+    """(RGB array, ink mask) for one period of the pattern, rendered once."""
+    cache = get_cache("pattern_tiles", maxsize=256)
+
+    def render():
+        size, painter = PATTERN_TILES[pattern]
+        tile = Image.new("RGBA", size, tuple(base_color) + (0,))
+        painter(ImageDraw.Draw(tile), base_color)
+        px = np.asarray(tile)
+        return px[:, :, :3], px[:, :, 3] > 0
+
+    return cache.get_or_compute((pattern, tuple(base_color)), render)
+
+def pattern_patch(pattern, base_color, size):
+    """
+    The tile repeated over a w x h region as a ready-to-paste (RGB image,
+    mask) pair. Garment areas are fixed, so each pattern / color / area is
+    tiled once and a fill is a single paste whatever the pattern's detail.
+    """
+    cache = get_cache("pattern_patches", maxsize=256)
+
+    def tile_out():
+        rgb, ink = pattern_tile(pattern, base_color)
+        w, h = size
+        reps = (-(-h // rgb.shape[0]), -(-w // rgb.shape[1]))
+        rgb = np.tile(rgb, reps + (1,))[:h, :w]
+        ink = np.tile(ink, reps)[:h, :w]
+        return Image.fromarray(np.ascontiguousarray(rgb)), Image.fromarray(ink.astype(np.uint8) * 255)
+
+    return cache.get_or_compute((pattern, tuple(base_color), size), tile_out)
+
+def fill_pattern(img, area, pattern, base_color):
+    # Unknown patterns (e.g. "None") leave the area as it is
+    if pattern not in PATTERN_TILES:
+        return
+    # Vector canvases (svg_draw.SvgDraw) get the tile as an SVG <pattern>
+    if hasattr(img, "pattern"):
+        size, painter = PATTERN_TILES[pattern]
+        img.pattern(area, size, painter, base_color)
+        return
+    x1, y1, x2, y2 = area
+    patch, mask = pattern_patch(pattern, base_color, (x2 - x1 + 1, y2 - y1 + 1))
+    img.paste(patch, (x1, y1), mask)
@@ -0,0 +1,67 @@
+import os
+import sys
+
+from PIL import Image, features
+
+from image_catalog import ImageCatalog, MANIFEST_NAME, RENDITION_DIR
+from image_store import build_pack
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+RENDITION_WIDTHS = (320, 640, 1280)
+
+if features.check("webp"):
+    RENDITION_FORMAT, RENDITION_EXT, SAVE_OPTIONS = "WEBP", "webp", {"quality": 80, "method": 4}
+else:
+    RENDITION_FORMAT, RENDITION_EXT, SAVE_OPTIONS = "JPEG", "jpg", {"quality": 85, "optimize": True}
+
+# ==============================================================================
+# INGEST
+# ==============================================================================
+def rendition_path(path, width):
+    cell_dir, name = os.path.split(path)
+    return os.path.join(cell_dir, RENDITION_DIR, f"{name}.w{width}.{RENDITION_EXT}")
+
+def create_renditions(path, widths=RENDITION_WIDTHS):
+    """
+    Write downscaled copies of one original next to it. Widths at or above
+    the original are skipped (the original is served instead); existing
+    renditions newer than the original are kept.
+    """
+    written = []
+    src_mtime = os.stat(path).st_mtime_ns
+    with Image.open(path) as img:
+        for width in widths:
+            if width >= img.width:
+                continue
+            out = rendition_path(path, width)
+            if os.path.exists(out) and os.stat(out).st_mtime_ns >= src_mtime:
+                continue
+
+            height = round(img.height * width / img.width)
+            small = img.resize((width, height), resample=Image.LANCZOS)
+            if RENDITION_FORMAT == "JPEG" and small.mode != "RGB":
+                small = small.convert("RGB")
+
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            small.save(out, RENDITION_FORMAT, **SAVE_OPTIONS)
+            written.append(out)
+    return written
+
+def ingest(base_dir="ai_images"):
+    catalog = ImageCatalog.build(base_dir)
+    written = []
+    for paths in catalog.cells.values():
+        for path in paths:
+            written.extend(create_renditions(path))
+
+    # Record the new renditions so app processes pick them up on start
+    catalog = ImageCatalog.build(base_dir)
+    catalog.save(os.path.join(base_dir, MANIFEST_NAME))
+    build_pack(catalog)
+    return written
+
+if __name__ == "__main__":
+    written = ingest(sys.argv[1] if len(sys.argv) > 1 else "ai_images")
+    print(f"{len(written)} renditions written")
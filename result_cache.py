@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ==============================================================================
+# LRU / TTL CACHE
+# ==============================================================================
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live per entry.
+    hits / misses are kept so callers can check how well a cache works.
+    """
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        # compute() runs outside the lock; a racing miss just computes twice
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
+
+# ==============================================================================
+# PROCESS-WIDE REGISTRY
+# ==============================================================================
+# Streamlit re-executes the app script on every rerun, so caches must live in
+# an imported module to survive between reruns and sessions.
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(name, maxsize=1024, ttl=None):
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = LRUCache(maxsize=maxsize, ttl=ttl)
+            _caches[name] = cache
+        return cache
+
+def clear_caches():
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.clear()
+
+def cache_stats():
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
+
+# ==============================================================================
+# KEYS
+# ==============================================================================
+def encode_scores(scores):
+    """
+    Compact, hashable key for a {name: score} dict. Slider scores are
+    integers 0-10, so names plus one byte per score; anything else falls
+    back to the exact values.
+    """
+    values = tuple(scores.values())
+    if all(isinstance(v, int) and 0 <= v <= 255 for v in values):
+        values = bytes(values)
+    return tuple(scores), values
@@ -0,0 +1,64 @@
+import hashlib
+import heapq
+import json
+import random
+import secrets
+
+# ==============================================================================
+# WEIGHTED SAMPLING
+# ==============================================================================
+def weighted_sample(items, weights, k, rng=random, group_key=None, conflicts=None):
+    """
+    Draw up to k distinct items, each pick proportional to its weight among
+    the items not yet picked (same distribution as repeated random.choices
+    + remove). Uses Efraimidis-Spirakis keys u ** (1 / w): O(n + k log n).
+    Items with weight <= 0 are never selected. With group_key, at most one
+    item per group is returned. With conflicts(a, b), an item that
+    conflicts with one already picked is skipped (e.g. near-duplicate
+    images, a relation that is not transitive and so can't be grouped).
+    """
+    if k <= 0:
+        return []
+
+    # Negated keys so heapq's min-heap pops the largest key first
+    heap = []
+    for idx, w in enumerate(weights):
+        if w > 0:
+            heap.append((-(rng.random() ** (1.0 / w)), idx))
+    heapq.heapify(heap)
+
+    # Largest keys first == order in which sequential draws would pick them
+    picked = []
+    seen_groups = set()
+    while heap and len(picked) < k:
+        item = items[heapq.heappop(heap)[1]]
+        if group_key is not None:
+            group = group_key(item)
+            if group in seen_groups:
+                continue
+            seen_groups.add(group)
+        if conflicts is not None and any(conflicts(item, p) for p in picked):
+            continue
+        picked.append(item)
+    return picked
+
+# ==============================================================================
+# SEEDED RNG STREAMS
+# ==============================================================================
+def derive_rng(session_seed, inputs, counter):
+    """
+    random.Random seeded from a stable hash of (session seed, inputs, request
+    counter). Replaying the same triple reproduces the same looks, which is
+    what makes results cacheable and benchmarks comparable.
+    """
+    payload = json.dumps([session_seed, inputs, counter], sort_keys=True, default=str)
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+def session_rng(state, inputs):
+    # state is st.session_state (or any dict): holds the seed and the counter
+    if "rng_seed" not in state:
+        state["rng_seed"] = secrets.randbits(64)
+    counter = state.get("rng_counter", 0)
+    state["rng_counter"] = counter + 1
+    return derive_rng(state["rng_seed"], inputs, counter)
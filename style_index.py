@@ -0,0 +1,146 @@
+import hashlib
+from types import MappingProxyType
+
+import numpy as np
+
+from affinity import AffinityTable
+from diversity import color_similarity, genre_similarity
+from result_cache import get_cache
+
+# ==============================================================================
+# VALIDATION
+# ==============================================================================
+def _casing_problems(label, names):
+    # One convention per list: "black" next to "Gray" is two spellings of a palette
+    upper = [n for n in names if n[:1].isupper()]
+    lower = [n for n in names if not n[:1].isupper()]
+    if upper and lower:
+        return [f"{label}: mixed-case names {', '.join(lower)} vs {', '.join(upper)}"]
+    return []
+
+def _key_problems(label, keys, names):
+    problems = []
+    folded = {n.casefold(): n for n in names}
+    for key in keys:
+        if key in names:
+            continue
+        near = folded.get(str(key).casefold())
+        hint = f" (did you mean {near!r}?)" if near else ""
+        problems.append(f"{label}: unknown name {key!r}{hint}")
+    return problems
+
+def validate_style(config):
+    """
+    Every problem with a StyleConfig-like class, as readable strings:
+    duplicate or mixed-case GENRES / COLORS, and COLOR_MAP, outfit library
+    and relation keys that are not exactly one of those names.
+    """
+    genres, colors = list(config.GENRES), list(config.COLORS)
+    problems = []
+    for label, names in (("GENRES", genres), ("COLORS", colors)):
+        if len({n.casefold() for n in names}) != len(names):
+            problems.append(f"{label}: duplicate names {names}")
+        problems += _casing_problems(label, names)
+
+    color_map = getattr(config, "COLOR_MAP", {})
+    problems += _key_problems("COLOR_MAP", color_map, colors)
+    problems += [f"COLOR_MAP: no RGB for {c!r}" for c in colors if c not in color_map]
+    for name, rgb in color_map.items():
+        if len(rgb) != 3 or not all(0 <= v <= 255 for v in rgb):
+            problems.append(f"COLOR_MAP: {name!r} is not an RGB triple: {rgb}")
+
+    library = _library(config)
+    problems += _key_problems("OUTFIT_LIBRARY", library, genres)
+    problems += [f"OUTFIT_LIBRARY: no items for {g!r}" for g in genres if g not in library]
+
+    for label, names in (("GENRE_RELATIONS", genres), ("COLOR_RELATIONS", colors)):
+        relations = getattr(config, label, {})
+        problems += _key_problems(label, relations, names)
+        for source, targets in relations.items():
+            problems += _key_problems(f"{label}[{source!r}]", targets, names)
+    return problems
+
+def _library(config):
+    # {genre: {slot: [items]}}; flat {genre: [items]} libraries (toku5) get one slot
+    library = getattr(config, "OUTFIT_LIBRARY", None) or getattr(config, "OUTFITS", {})
+    return {
+        genre: slots if isinstance(slots, dict) else {"items": slots}
+        for genre, slots in library.items()
+    }
+
+# ==============================================================================
+# COMPILED CONFIG
+# ==============================================================================
+class CompiledStyle:
+    """
+    A StyleConfig compiled for the engines: names get fixed integer IDs
+    (their position in GENRES / COLORS), palette, affinities and pairwise
+    similarities become contiguous NumPy arrays and the outfit library
+    becomes per-slot (genre x item) ID arrays, padded with -1. Use
+    compiled_style() so a config is compiled once per process, not per rerun.
+    """
+    def __init__(self, config):
+        problems = validate_style(config)
+        if problems:
+            raise ValueError(f"invalid {config.__name__}:\n  " + "\n  ".join(problems))
+
+        self.genres = tuple(config.GENRES)
+        self.colors = tuple(config.COLORS)
+        self.genre_id = MappingProxyType({g: i for i, g in enumerate(self.genres)})
+        self.color_id = MappingProxyType({c: i for i, c in enumerate(self.colors)})
+        self.rgb = _frozen(np.array([config.COLOR_MAP[c] for c in self.colors], dtype=np.uint8))
+        self.genre_affinity = AffinityTable(getattr(config, "GENRE_RELATIONS", {}), self.genres)
+        self.color_affinity = AffinityTable(getattr(config, "COLOR_RELATIONS", {}), self.colors)
+        self.genre_similarity = _frozen(genre_similarity(self.genre_affinity.closure))
+        self.color_similarity = _frozen(color_similarity(self.rgb))
+
+        library = _library(config)
+        self.slots = tuple(dict.fromkeys(s for g in self.genres for s in library[g]))
+        self.item_names = tuple(dict.fromkeys(
+            item for g in self.genres for s in self.slots for item in library[g].get(s, [])
+        ))
+        item_id = {item: i for i, item in enumerate(self.item_names)}
+        self.items = {}
+        self.item_counts = {}
+        for slot in self.slots:
+            rows = [[item_id[item] for item in library[g].get(slot, [])] for g in self.genres]
+            width = max(len(r) for r in rows)
+            ids = np.full((len(rows), width), -1, dtype=np.int32)
+            for gid, row in enumerate(rows):
+                ids[gid, :len(row)] = row
+            self.items[slot] = _frozen(ids)
+            self.item_counts[slot] = _frozen(np.array([len(r) for r in rows], dtype=np.int32))
+        self.items = MappingProxyType(self.items)
+        self.item_counts = MappingProxyType(self.item_counts)
+
+    def genre_vector(self, scores):
+        # {name: score} -> array indexed by genre ID; names missing from scores are 0
+        return _vector(scores, self.genre_id)
+
+    def color_vector(self, scores):
+        return _vector(scores, self.color_id)
+
+    def slot_items(self, genre_id, slot):
+        """Item names for a genre's slot, in library order."""
+        ids = self.items[slot][genre_id, :self.item_counts[slot][genre_id]]
+        return [self.item_names[i] for i in ids]
+
+def _vector(scores, ids):
+    vec = np.zeros(len(ids))
+    for name, score in scores.items():
+        vec[ids[name]] = score
+    return vec
+
+def _frozen(arr):
+    arr.setflags(write=False)
+    return arr
+
+def compiled_style(config):
+    """
+    CompiledStyle for a config, memoized on its content: a Streamlit rerun
+    redefines StyleConfig as a new class, but equal data compiles only once.
+    """
+    data = {name: value for name, value in vars(config).items() if name.isupper()}
+    digest = hashlib.blake2b(repr(data).encode("utf-8"), digest_size=16).hexdigest()
+    cache = get_cache("compiled_styles", maxsize=16)
+    return cache.get_or_compute(digest, lambda: CompiledStyle(config))
@@ -0,0 +1,180 @@
+import math
+import time
+from contextlib import contextmanager
+
+from PIL import Image, ImageDraw
+
+from image_encoding import EncodedImage
+
+# ==============================================================================
+# CONFIG
+# ==============================================================================
+# Output of every procedural avatar page: SVG for the browser to rasterize,
+# or server-side PNG. Raster stays the default until the SVG output has been
+# compared visually with it.
+OUTPUT_SVG = False
+
+# ==============================================================================
+# SVG CANVAS
+# ==============================================================================
+def _color(c):
+    if c is None:
+        return "none"
+    if isinstance(c, str):
+        return c
+    if len(c) == 4 and c[3] < 255:
+        return f"rgba({c[0]},{c[1]},{c[2]},{c[3] / 255:.2f})"
+    return "#%02x%02x%02x" % tuple(c[:3])
+
+def _num(v):
+    return f"{v:g}" if isinstance(v, float) else str(v)
+
+def _points(xy):
+    # ImageDraw accepts [(x, y), ...] or a flat [x0, y0, x1, y1, ...]
+    if xy and not isinstance(xy[0], (tuple, list)):
+        xy = list(zip(xy[0::2], xy[1::2]))
+    return [(x, y) for x, y in xy]
+
+class SvgDraw:
+    """
+    Stand-in for PIL's ImageDraw that records the same rectangles, ellipses,
+    polygons, lines and arcs as SVG elements. Pixel boxes are inclusive like
+    ImageDraw's; outlines are inset so they stay inside the box as in PIL.
+    The browser rasterizes (and scales) the result.
+    """
+    def __init__(self, size, background=None):
+        self.size = size
+        self.background = background
+        self.elements = []
+        self.defs = []
+        # (x1, x2, fill, y0, y_end, element index) of the last horizontal line run
+        self._run = None
+
+    def _paint(self, fill, outline, width):
+        attrs = f' fill="{_color(fill)}"'
+        if outline is not None and width:
+            attrs += f' stroke="{_color(outline)}" stroke-width="{_num(width)}"'
+        return attrs
+
+    def rectangle(self, xy, fill=None, outline=None, width=1):
+        (x1, y1), (x2, y2) = _points(xy)
+        inset = width / 2 if outline is not None else 0
+        self.elements.append(
+            f'<rect x="{_num(x1 + inset)}" y="{_num(y1 + inset)}" '
+            f'width="{_num(x2 - x1 + 1 - 2 * inset)}" height="{_num(y2 - y1 + 1 - 2 * inset)}"'
+            f'{self._paint(fill, outline, width)}/>'
+        )
+
+    def ellipse(self, xy, fill=None, outline=None, width=1):
+        (x1, y1), (x2, y2) = _points(xy)
+        inset = width / 2 if outline is not None else 0
+        self.elements.append(
+            f'<ellipse cx="{_num((x1 + x2 + 1) / 2)}" cy="{_num((y1 + y2 + 1) / 2)}" '
+            f'rx="{_num((x2 - x1 + 1) / 2 - inset)}" ry="{_num((y2 - y1 + 1) / 2 - inset)}"'
+            f'{self._paint(fill, outline, width)}/>'
+        )
+
+    def polygon(self, xy, fill=None, outline=None, width=1):
+        pts = " ".join(f"{_num(x)},{_num(y)}" for x, y in _points(xy))
+        self.elements.append(f'<polygon points="{pts}"{self._paint(fill, outline, width)}/>')
+
+    def line(self, xy, fill=None, width=0):
+        # A w-px ImageDraw line through x covers pixels x .. x + w - 1
+        width = max(width, 1)
+        pts = _points(xy)
+        if len(pts) == 2 and pts[0][1] == pts[1][1]:
+            self._hline(pts, fill, width)
+            return
+        pts = " ".join(f"{_num(x + width / 2)},{_num(y + width / 2)}" for x, y in pts)
+        self.elements.append(
+            f'<polyline points="{pts}" fill="none" stroke="{_color(fill)}" '
+            f'stroke-width="{width}"/>'
+        )
+
+    def _hline(self, pts, fill, width):
+        # Row-by-row gradients: stacked same-color rows merge into one rect
+        (xa, y), (xb, _) = pts
+        x1, x2 = min(xa, xb), max(xa, xb)
+        run = self._run
+        if run and run[:3] == (x1, x2, fill) and y == run[4] and run[5] == len(self.elements) - 1:
+            y0 = run[3]
+        else:
+            y0 = y
+            self.elements.append(None)
+        y1 = y + width
+        self._run = (x1, x2, fill, y0, y1, len(self.elements) - 1)
+        self.elements[-1] = (
+            f'<rect x="{x1}" y="{y0}" width="{x2 - x1 + 1}" height="{y1 - y0}" fill="{_color(fill)}"/>'
+        )
+
+    def arc(self, xy, start, end, fill=None, width=1):
+        # Angles in degrees, clockwise from 3 o'clock, as in ImageDraw.arc
+        (x1, y1), (x2, y2) = _points(xy)
+        cx, cy = (x1 + x2 + 1) / 2, (y1 + y2 + 1) / 2
+        rx, ry = (x2 - x1 + 1 - width) / 2, (y2 - y1 + 1 - width) / 2
+        sweep = (end - start) % 360 or 360
+        a0, a1 = math.radians(start), math.radians(start + sweep)
+        self.elements.append(
+            f'<path d="M{cx + rx * math.cos(a0):.1f},{cy + ry * math.sin(a0):.1f} '
+            f'A{_num(rx)},{_num(ry)} 0 {int(sweep > 180)} 1 '
+            f'{cx + rx * math.cos(a1):.1f},{cy + ry * math.sin(a1):.1f}" '
+            f'fill="none" stroke="{_color(fill)}" stroke-width="{_num(width)}"/>'
+        )
+
+    @contextmanager
+    def group(self, dx=0, dy=0, scale=1):
+        # Shapes drawn inside the block are translated, then scaled
+        self.elements.append(f'<g transform="translate({_num(dx)},{_num(dy)}) scale({_num(scale)})">')
+        try:
+            yield self
+        finally:
+            self.elements.append("</g>")
+
+    def pattern(self, area, tile_size, painter, *args):
+        """Fill area with a tile painted by painter(draw, *args), as an SVG <pattern>."""
+        x1, y1, x2, y2 = area
+        tile = SvgDraw(tile_size)
+        painter(tile, *args)
+        pid = f"p{len(self.defs)}"
+        w, h = tile_size
+        self.defs.append(
+            f'<pattern id="{pid}" x="{x1}" y="{y1}" width="{w}" height="{h}" '
+            f'patternUnits="userSpaceOnUse">{"".join(tile.elements)}</pattern>'
+        )
+        self.elements.append(
+            f'<rect x="{x1}" y="{y1}" width="{x2 - x1 + 1}" height="{y2 - y1 + 1}" fill="url(#{pid})"/>'
+        )
+
+    def to_svg(self, width=None, height=None):
+        # width / height set the display size; the viewBox keeps drawing coordinates
+        w, h = self.size
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width or w}" height="{height or h}" '
+            f'viewBox="0 0 {w} {h}">'
+        ]
+        if self.defs:
+            parts.append(f'<defs>{"".join(self.defs)}</defs>')
+        if self.background is not None:
+            parts.append(f'<rect width="100%" height="100%" fill="{_color(self.background)}"/>')
+        parts.extend(self.elements)
+        parts.append("</svg>")
+        return "".join(parts)
+
+    def encode(self, width=None, height=None):
+        start = time.perf_counter()
+        svg = self.to_svg(width, height)
+        return EncodedImage(svg, "SVG", (time.perf_counter() - start) * 1000)
+
+def new_canvas(size, background, svg=None):
+    """
+    (image, draw) for a renderer: a PIL image and its ImageDraw, or a single
+    SvgDraw playing both parts. Either one goes to image_encoding.cached_encode.
+    svg=None follows OUTPUT_SVG.
+    """
+    if svg is None:
+        svg = OUTPUT_SVG
+    if svg:
+        canvas = SvgDraw(size, background)
+        return canvas, canvas
+    img = Image.new("RGB", size, background)
+    return img, ImageDraw.Draw(img)
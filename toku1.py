@@ -1,6 +1,8 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw
+
+from image_encoding import cached_encode
+from svg_draw import new_canvas
 
 # ==============================================================================
 # CONFIG
@@ -86,9 +88,8 @@ def similarity(user_vec, outfit_vec):
 # ==============================================================================
 # AVATAR RENDERER
 # ==============================================================================
-def render_avatar(outfit):
-    img = Image.new("RGB", (260, 440), (245, 245, 245))
-    d = ImageDraw.Draw(img)
+def render_avatar(outfit, svg=None):
+    img, d = new_canvas((260, 440), (245, 245, 245), svg)
 
     main_color = COLOR_MAP[outfit["colors"][0]]
     skin = (235, 215, 200)
@@ -111,7 +112,7 @@ def render_avatar(outfit):
     d.rectangle([95, 260, 125, 400], fill=main_color)
     d.rectangle([135, 260, 165, 400], fill=main_color)
 
-    return img
+    return cached_encode(img)
 
 # ==============================================================================
 # UI
@@ -152,7 +153,7 @@ if st.session_state["trigger"]:
     for col, (_, outfit) in zip(cols, top_outfits):
         with col:
             img = render_avatar(outfit)
-            st.image(img)
+            st.image(img.data, output_format=img.format)
             st.markdown(f"### {outfit['genre']}")
             st.caption(f"Colors: {', '.join(outfit['colors'])}")
             st.write("**Items**")
@@ -1,6 +1,8 @@
 import streamlit as st
 import random
 
+from sampling import session_rng
+
 # =====================
 # GitHub RAW URL（要変更）
 # =====================
@@ -38,7 +40,7 @@ def get_top_items(score_dict, top_n=3):
 # =====================
 # 推薦ロジック
 # =====================
-def recommend_images(gender, style_scores, color_scores, n=3):
+def recommend_images(gender, style_scores, color_scores, n=3, rng=random):
     top_styles = get_top_items(style_scores)
     top_colors = get_top_items(color_scores)
 
@@ -52,7 +54,7 @@ def recommend_images(gender, style_scores, color_scores, n=3):
     if not candidates:
         candidates = [img for img in IMAGE_DB if img["gender"] == gender]
 
-    return random.sample(candidates, min(n, len(candidates)))
+    return rng.sample(candidates, min(n, len(candidates)))
 
 # =====================
 # Streamlit UI
@@ -83,7 +85,8 @@ color_scores = {
 }
 
 if st.button("おすすめを見る"):
-    results = recommend_images(gender, style_scores, color_scores, n=3)
+    rng = session_rng(st.session_state, [gender, style_scores, color_scores])
+    results = recommend_images(gender, style_scores, color_scores, n=3, rng=rng)
 
     st.subheader("✨ Recommended Outfits")
     cols = st.columns(3)
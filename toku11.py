@@ -1,6 +1,8 @@
 import streamlit as st
 import random
-import os
+from image_catalog import ImageCatalog
+from image_view import show_image
+from sampling import session_rng
 
 # ==============================================================================
 # PAGE CONFIG
@@ -57,36 +59,18 @@ class StyleConfig:
 # ==============================================================================
 class ImageRecommender:
     @staticmethod
-    def recommend(gender, style_scores, color_scores, max_images=3):
+    def recommend(gender, style_scores, color_scores, max_images=3, rng=random):
         base_dir = "ai_images"
         gender_dir = "male" if gender == "male" else "female"
-
-        candidates = []
-
-        for style, s_score in style_scores.items():
-            for color, c_score in color_scores.items():
-                weight = s_score + c_score
-                if weight <= 0:
-                    continue
-
-                path = os.path.join(base_dir, gender_dir, style, color)
-                if os.path.exists(path):
-                    for file in os.listdir(path):
-                        if file.lower().endswith((".png", ".jpg", ".jpeg")):
-                            candidates.append({
-                                "path": os.path.join(path, file),
-                                "style": style,
-                                "color": color,
-                                "weight": weight,
-                                "style_score": s_score,
-                                "color_score": c_score
-                            })
-
+        # Slider scores are integers: weight >= 1 is the old "weight > 0"
+        candidates = ImageCatalog.get(base_dir).candidates(
+            gender_dir, style_scores, color_scores, 1
+        )
         if not candidates:
             return []
 
         weights = [c["weight"] for c in candidates]
-        selected = random.choices(candidates, weights=weights, k=min(max_images, len(candidates)))
+        selected = rng.choices(candidates, weights=weights, k=min(max_images, len(candidates)))
 
         return selected
 
@@ -140,15 +124,16 @@ def main():
             gender=gender,
             style_scores=style_scores,
             color_scores=color_scores,
-            max_images=3
+            max_images=3,
+            rng=session_rng(st.session_state, [gender, style_scores, color_scores])
         )
 
     if st.session_state["images"]:
         cols = st.columns(3)
 
-        for col, img in zip(cols, st.session_state["images"]):
+        for idx, (col, img) in enumerate(zip(cols, st.session_state["images"])):
             with col:
-                st.image(img["path"], use_container_width=True)
+                show_image(img, idx)
 
                 st.markdown(f"### {img['style'].capitalize()}")
                 st.caption(f"Color: {img['color']}")
@@ -2,6 +2,8 @@ import streamlit as st
 import random
 import os
 
+from sampling import session_rng
+
 # ==============================================================================
 # PAGE CONFIG
 # ==============================================================================
@@ -57,7 +59,7 @@ class StyleConfig:
 # ==============================================================================
 class ImageRecommender:
     @staticmethod
-    def recommend(gender, styles, colors, max_images=3):
+    def recommend(gender, styles, colors, max_images=3, rng=random):
         base_dir = "ai_images"
         gender_dir = "male" if gender == "male" else "female"
 
@@ -78,7 +80,7 @@ class ImageRecommender:
         if not candidates:
             return []
 
-        return random.sample(candidates, min(max_images, len(candidates)))
+        return rng.sample(candidates, min(max_images, len(candidates)))
 
 # ==============================================================================
 # SIDEBAR
@@ -126,7 +128,8 @@ def main():
             gender=gender,
             styles=styles if styles else StyleConfig.GENRES,
             colors=colors if colors else StyleConfig.COLORS,
-            max_images=3
+            max_images=3,
+            rng=session_rng(st.session_state, [gender, styles, colors])
         )
 
     if st.session_state["images"]:
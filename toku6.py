@@ -3,6 +3,8 @@ import os
 import random
 from PIL import Image
 
+from sampling import session_rng
+
 # ==================================================
 # PAGE CONFIG
 # ==================================================
@@ -32,11 +34,11 @@ def get_images(gender, style, color):
         if f.lower().endswith((".png", ".jpg", ".jpeg"))
     ]
 
-def recommend_images(gender, style, color, n=3):
+def recommend_images(gender, style, color, n=3, rng=random):
     images = get_images(gender, style, color)
     if len(images) == 0:
         return []
-    return random.sample(images, min(n, len(images)))
+    return rng.sample(images, min(n, len(images)))
 
 # ==================================================
 # SIDEBAR
@@ -59,7 +61,9 @@ st.title("AI Outfit Recommendation")
 st.caption("Images are loaded directly from GitHub repository")
 
 if recommend:
-    images = recommend_images(gender, style, color)
+    images = recommend_images(
+        gender, style, color, rng=session_rng(st.session_state, [gender, style, color])
+    )
 
     if not images:
         st.error("該当する画像が見つかりません。フォルダ構成を確認してください。")
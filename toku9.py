@@ -1,6 +1,8 @@
 import streamlit as st
 import random
 
+from sampling import session_rng
+
 # =====================
 # GitHub RAW URL
 # =====================
@@ -36,7 +38,7 @@ def get_top_items(score_dict, top_n=3):
 # =====================
 # 画像推薦ロジック
 # =====================
-def recommend_images(style_scores, color_scores, n=3):
+def recommend_images(style_scores, color_scores, n=3, rng=random):
     top_styles = get_top_items(style_scores, top_n=3)
     top_colors = get_top_items(color_scores, top_n=3)
 
@@ -48,7 +50,7 @@ def recommend_images(style_scores, color_scores, n=3):
     if not candidates:
         candidates = IMAGE_DB.copy()
 
-    return random.sample(
+    return rng.sample(
         candidates, min(n, len(candidates))
     )
 
@@ -73,7 +75,8 @@ color_scores = {
 }
 
 if st.button("おすすめを見る"):
-    results = recommend_images(style_scores, color_scores, n=3)
+    rng = session_rng(st.session_state, [style_scores, color_scores])
+    results = recommend_images(style_scores, color_scores, n=3, rng=rng)
 
     st.subheader("✨ Recommended Outfits")
     cols = st.columns(3)
@@ -1,6 +1,8 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw, ImageFont
+
+from avatar_renderer import AVATAR_BACKEND, PALETTE, AvatarRenderer
+from sampling import session_rng
 
 # ==============================================================================
 # CONFIG & STYLES
@@ -81,16 +83,7 @@ class StyleConfig:
     COLORS = ["Black", "White", "Gray", "Navy", "Brown", "Beige", "Green", "Red"]
     
     # Enhanced Palette (RGB)
-    COLOR_MAP = {
-        "Black": (20, 20, 20),
-        "White": (245, 245, 245),
-        "Gray": (120, 120, 125),
-        "Navy": (30, 45, 80),
-        "Brown": (100, 70, 50),
-        "Beige": (220, 210, 190),
-        "Green": (55, 90, 60),
-        "Red": (160, 40, 40)
-    }
+    COLOR_MAP = PALETTE
 
     OUTFIT_LIBRARY = {
         "Streetwear": {
@@ -142,7 +135,7 @@ class StyleConfig:
 # ==============================================================================
 class OutfitGenerator:
     @staticmethod
-    def get_complementary_color(base_color, all_colors):
+    def get_complementary_color(base_color, all_colors, rng=random):
         # Basic pairings for better harmony
         pairs = {
             "Black": ["White", "Gray", "Beige", "Red"],
@@ -155,22 +148,22 @@ class OutfitGenerator:
             "Red": ["Black", "White", "Denim"] # Denim handled as Navy visual often
         }
         candidates = pairs.get(base_color, all_colors)
-        return random.choice(candidates)
+        return rng.choice(candidates)
 
     @staticmethod
-    def create(genre, base_color, gender, use_outer, all_colors):
+    def create(genre, base_color, gender, use_outer, all_colors, rng=random):
         lib = StyleConfig.OUTFIT_LIBRARY.get(genre, StyleConfig.OUTFIT_LIBRARY["Casual"])
         
         # Color Logic
-        accent_color = OutfitGenerator.get_complementary_color(base_color, all_colors)
+        accent_color = OutfitGenerator.get_complementary_color(base_color, all_colors, rng)
         
         # Item Selection
-        is_skirt = (gender == "Female" and random.random() < 0.6)
+        is_skirt = (gender == "Female" and rng.random() < 0.6)
         
-        inner_item = random.choice(lib["inner"])
-        outer_item = random.choice(lib["outer"]) if use_outer else None
-        bottom_item = random.choice(lib["skirt"]) if is_skirt else random.choice(lib["bottom"])
-        shoe_item = random.choice(lib["shoe"])
+        inner_item = rng.choice(lib["inner"])
+        outer_item = rng.choice(lib["outer"]) if use_outer else None
+        bottom_item = rng.choice(lib["skirt"]) if is_skirt else rng.choice(lib["bottom"])
+        shoe_item = rng.choice(lib["shoe"])
 
         return {
             "genre": genre,
@@ -188,82 +181,6 @@ class OutfitGenerator:
             }
         }
 
-class AvatarRenderer:
-    @staticmethod
-    def render(outfit):
-        # High-res canvas for anti-aliasing (resize down later)
-        W, H = 500, 900
-        img = Image.new("RGB", (W, H), (250, 250, 250))
-        draw = ImageDraw.Draw(img)
-
-        # Colors
-        c_main = StyleConfig.COLOR_MAP[outfit["main_color"]]
-        c_accent = StyleConfig.COLOR_MAP[outfit["accent_color"]]
-        c_skin = (235, 215, 200)
-        c_hair = (40, 30, 30)
-        
-        # Helper to darken a color slightly for outlines/shading
-        def shade(rgb, factor=0.85):
-            return tuple(int(x * factor) for x in rgb)
-
-        # --- DRAWING LAYERS ---
-        
-        # 1. Body/Head
-        # Head
-        draw.ellipse([200, 50, 300, 160], fill=c_skin)
-        # Neck
-        draw.rectangle([235, 150, 265, 190], fill=c_skin)
-        
-        meta = outfit["meta"]
-        items = outfit["items"]
-
-        # 2. Bottoms
-        # If skirt, draw specialized shape
-        pants_color = c_main # Monochromatic base usually looks good for bottoms
-        
-        if meta["is_skirt"]:
-            # Skirt shape
-            draw.polygon([
-                (180, 450), (320, 450), # Waist
-                (360, 650), (140, 650)  # Hem
-            ], fill=pants_color)
-            # Legs
-            draw.rectangle([210, 650, 240, 800], fill=c_skin)
-            draw.rectangle([260, 650, 290, 800], fill=c_skin)
-        else:
-            # Pants shape
-            draw.rectangle([180, 450, 320, 800], fill=pants_color)
-            # Gap between legs
-            draw.polygon([(245, 450), (255, 450), (255, 800), (245, 800)], fill=(250,250,250)) 
-
-        # 3. Inner Top
-        inner_color = c_accent
-        draw.rectangle([180, 180, 320, 460], fill=inner_color) # Torso
-        draw.rectangle([150, 180, 190, 350], fill=inner_color) # Left Arm base
-        draw.rectangle([310, 180, 350, 350], fill=inner_color) # Right Arm base
-        
-        # Hands
-        draw.ellipse([140, 340, 190, 390], fill=c_skin)
-        draw.ellipse([310, 340, 360, 390], fill=c_skin)
-
-        # 4. Outerwear (if creates)
-        if meta["has_outer"] and items["outer"]:
-            outer_color = c_main
-            # Open Jacket look
-            draw.rectangle([140, 170, 210, 480], fill=outer_color) # Left panel
-            draw.rectangle([290, 170, 360, 480], fill=outer_color) # Right panel
-            # Sleeves
-            draw.rectangle([120, 180, 170, 420], fill=outer_color)
-            draw.rectangle([330, 180, 380, 420], fill=outer_color)
-
-        # 5. Shoes
-        shoe_color = (30,30,30)
-        draw.rectangle([190, 800, 240, 850], fill=shoe_color)
-        draw.rectangle([260, 800, 310, 850], fill=shoe_color)
-
-        # Resize for better quality (Antialiasing hack)
-        return img.resize((250, 450), resample=Image.LANCZOS)
-
 # ==============================================================================
 # UI COMPONENTS
 # ==============================================================================
@@ -324,24 +241,26 @@ def main():
         possible_genres = config["genres"]
         possible_colors = config["colors"]
         
+        # Same session + same inputs + same click count -> same looks
+        rng = session_rng(st.session_state, config)
+
         for _ in range(3):
-            g = random.choice(possible_genres)
-            c = random.choice(possible_colors)
-            outfit = OutfitGenerator.create(g, c, config["gender"], config["use_outer"], possible_colors)
+            g = rng.choice(possible_genres)
+            c = rng.choice(possible_colors)
+            outfit = OutfitGenerator.create(g, c, config["gender"], config["use_outer"], possible_colors, rng)
             new_outfits.append(outfit)
             
         st.session_state["outfits"] = new_outfits
 
     # Display Gallery
     if st.session_state["outfits"]:
+        # All looks in one image: a single encode/upload, one avatar above each column
+        strip = AvatarRenderer.encode_strip(st.session_state["outfits"], backend=AVATAR_BACKEND)
+        st.image(strip.data, output_format=strip.format, use_container_width=True)
         cols = st.columns(3)
         
         for idx, (col, outfit) in enumerate(zip(cols, st.session_state["outfits"])):
             with col:
-                # Custom container style via markdown hack or just clean layout
-                img = AvatarRenderer.render(outfit)
-                st.image(img, use_container_width=True)
-                
                 st.markdown(f"### {outfit['genre']}")
                 st.caption(f"{outfit['main_color']} & {outfit['accent_color']}")
                 
@@ -1,6 +1,12 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+
+from avatar_renderer import AVATAR_BACKEND, PALETTE, AvatarRenderer
+from diversity import MMR_POOL, CandidateSimilarity, mmr_select
+from result_cache import cache_stats, get_cache
+from sampling import session_rng, weighted_sample
+from style_index import compiled_style
 
 # ==============================================================================
 # CONFIG & STYLES
@@ -105,16 +111,7 @@ class StyleConfig:
     COLORS = ["Black", "White", "Gray", "Navy", "Brown", "Beige", "Green", "Red"]
     
     # Enhanced Palette (RGB)
-    COLOR_MAP = {
-        "Black": (20, 20, 20),
-        "White": (245, 245, 245),
-        "Gray": (120, 120, 125),
-        "Navy": (30, 45, 80),
-        "Brown": (100, 70, 50),
-        "Beige": (220, 210, 190),
-        "Green": (55, 90, 60),
-        "Red": (160, 40, 40)
-    }
+    COLOR_MAP = PALETTE
 
     OUTFIT_LIBRARY = {
         "Streetwear": {
@@ -182,60 +179,64 @@ class StyleConfig:
         "Red": {"Brown": 0.3, "Black": 0.2}
     }
 
+# Compiled (and validated) once per process, not per rerun: integer IDs,
+# palette / affinity / similarity arrays, per-slot item ID arrays
+STYLE = compiled_style(StyleConfig)
+
 # ==============================================================================
 # LOGIC CORE
 # ==============================================================================
 class RecommendationEngine:
     @staticmethod
-    def infer_weights(user_scores, relations, all_keys):
+    def infer_weights(scores, affinity, multi_hop=True):
         """
         If a user scores an item 0, try to infer a weight based on their positive scores
-        and the relation matrix.
+        and the compiled affinity table (STYLE.genre_affinity / color_affinity).
         NewWeight = Max( OtherScore * Affinity ) for all OtherItems
+        With multi_hop, Affinity is the best path (e.g. Techwear -> Minimal -> Formal)
+        from the table's precomputed closure; otherwise the direct relation only.
+        scores and the returned weights are indexed by ID (STYLE.genre_vector).
+        Results are memoized per (scores, table) in a process-wide LRU.
         """
-        final_weights = []
-        for key in all_keys:
-            current_score = user_scores.get(key, 0)
-            
-            if current_score > 0:
-                final_weights.append(current_score)
-            else:
-                # Inference Logic
-                inferred_score = 0
-                # Check all other items the user Liked
-                for other_key, other_score in user_scores.items():
-                    if other_score > 0 and other_key != key:
-                        # Get affinity from other -> key or key -> other (undirected mostly)
-                        affinity = relations.get(other_key, {}).get(key, 0)
-                        # Also check reverse if not present (symmetry)
-                        if affinity == 0:
-                            affinity = relations.get(key, {}).get(other_key, 0)
-                            
-                        # Calculate potential score
-                        impact = other_score * affinity
-                        if impact > inferred_score:
-                            inferred_score = impact
-                
-                # Apply a slight penalty to inferred scores so explicit choices usually win
-                # But floor it at 0
-                final_weights.append(max(0, inferred_score * 0.8))
-        
-        return final_weights
+        cache = get_cache("infer_weights", maxsize=2048)
+        scores = np.asarray(scores, dtype=np.float64)
+        key = (scores.tobytes(), affinity.digest, multi_hop)
+        return list(cache.get_or_compute(
+            key, lambda: RecommendationEngine.infer_weights_batch(scores[None, :], affinity, multi_hop)[0].tolist()
+        ))
+
+    @staticmethod
+    def infer_weights_batch(scores, affinity, multi_hop=True):
+        """
+        infer_weights for many score vectors at once: scores is
+        (n_sessions x len(affinity.keys)), one column per ID.
+        Inferred = Max over liked others( OtherScore * A[other, key] ) * 0.8
+        as one broadcast over (n_sessions x others x keys).
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        matrix = affinity.matrix(multi_hop)
+        liked = np.where(scores > 0, scores, 0.0)
+        inferred = (liked[:, :, None] * matrix[None, :, :]).max(axis=1)
+        # Apply a slight penalty to inferred scores so explicit choices usually win
+        # But floor it at 0
+        return np.where(scores > 0, scores, np.maximum(0, inferred * 0.8))
 
 class OutfitGenerator:
+    # Basic pairings for better harmony
+    COLOR_PAIRS = {
+        "Black": ["White", "Gray", "Beige", "Red"],
+        "White": ["Black", "Navy", "Beige", "Gray"],
+        "Navy": ["White", "Beige", "Gray"],
+        "Brown": ["Beige", "White", "Navy"],
+        "Beige": ["Brown", "Navy", "Black", "White"],
+        "Gray": ["Black", "White", "Navy"],
+        "Green": ["Beige", "Black", "White"],
+        "Red": ["Black", "White", "Denim"] # Denim handled as Navy visual often
+    }
+
     @staticmethod
-    def get_complementary_color(base_color, color_scores):
-        # Basic pairings for better harmony
-        pairs = {
-            "Black": ["White", "Gray", "Beige", "Red"],
-            "White": ["Black", "Navy", "Beige", "Gray"],
-            "Navy": ["White", "Beige", "Gray"],
-            "Brown": ["Beige", "White", "Navy"],
-            "Beige": ["Brown", "Navy", "Black", "White"],
-            "Gray": ["Black", "White", "Navy"],
-            "Green": ["Beige", "Black", "White"],
-            "Red": ["Black", "White", "Denim"] # Denim handled as Navy visual often
-        }
+    def get_complementary_color(base_color, color_scores, rng=random):
+        pairs = OutfitGenerator.COLOR_PAIRS
         # Get candidates list
         all_colors = list(color_scores.keys())
         candidates = pairs.get(base_color, all_colors)
@@ -247,22 +248,25 @@ class OutfitGenerator:
         if sum(weights) == 0:
             weights = [1] * len(candidates)
             
-        return random.choices(candidates, weights=weights, k=1)[0]
+        return rng.choices(candidates, weights=weights, k=1)[0]
 
     @staticmethod
-    def create(genre, base_color, gender, use_outer, color_scores):
-        lib = StyleConfig.OUTFIT_LIBRARY.get(genre, StyleConfig.OUTFIT_LIBRARY["Casual"])
+    def create(genre_id, color_id, gender, use_outer, color_scores, rng=random, accent_id=None):
+        genre, base_color = STYLE.genres[genre_id], STYLE.colors[color_id]
         
-        # Color Logic
-        accent_color = OutfitGenerator.get_complementary_color(base_color, color_scores)
+        # Color Logic (LookScorer picks the accent together with genre and main color)
+        if accent_id is not None:
+            accent_color = STYLE.colors[accent_id]
+        else:
+            accent_color = OutfitGenerator.get_complementary_color(base_color, color_scores, rng)
         
         # Item Selection
-        is_skirt = (gender == "Female" and random.random() < 0.6)
+        is_skirt = (gender == "Female" and rng.random() < 0.6)
         
-        inner_item = random.choice(lib["inner"])
-        outer_item = random.choice(lib["outer"]) if use_outer else None
-        bottom_item = random.choice(lib["skirt"]) if is_skirt else random.choice(lib["bottom"])
-        shoe_item = random.choice(lib["shoe"])
+        inner_item = rng.choice(STYLE.slot_items(genre_id, "inner"))
+        outer_item = rng.choice(STYLE.slot_items(genre_id, "outer")) if use_outer else None
+        bottom_item = rng.choice(STYLE.slot_items(genre_id, "skirt" if is_skirt else "bottom"))
+        shoe_item = rng.choice(STYLE.slot_items(genre_id, "shoe"))
 
         return {
             "genre": genre,
@@ -280,81 +284,85 @@ class OutfitGenerator:
             }
         }
 
-class AvatarRenderer:
+class LookScorer:
+    """
+    Scores every (genre, main color, accent) combination at once as a
+    (genres x colors x accents) tensor. score() is the probability of the
+    look under the inferred weights and the accent pairings, the same
+    distribution main() used to draw from piece by piece; preference() is
+    the unnormalised rating used to rank looks. Items carry no preference,
+    so they are picked per look afterwards.
+    """
     @staticmethod
-    def render(outfit):
-        # High-res canvas for anti-aliasing (resize down later)
-        W, H = 500, 900
-        img = Image.new("RGB", (W, H), (250, 250, 250))
-        draw = ImageDraw.Draw(img)
-
-        # Colors
-        c_main = StyleConfig.COLOR_MAP[outfit["main_color"]]
-        c_accent = StyleConfig.COLOR_MAP[outfit["accent_color"]]
-        c_skin = (235, 215, 200)
-        c_hair = (40, 30, 30)
-        
-        # Helper to darken a color slightly for outlines/shading
-        def shade(rgb, factor=0.85):
-            return tuple(int(x * factor) for x in rgb)
+    def pairing_matrix(color_scores):
+        # W[main, accent]: the accent's slider score where the pairing exists, else 0
+        n = len(STYLE.colors)
+        weights = np.zeros((n, n))
+        for main_id, main in enumerate(STYLE.colors):
+            candidates = OutfitGenerator.COLOR_PAIRS.get(main, STYLE.colors)
+            # Pairings without a palette entry (Denim) can't be drawn
+            ids = [STYLE.color_id[c] for c in candidates if c in STYLE.color_id]
+            row = np.array([color_scores.get(STYLE.colors[i], 0) for i in ids], dtype=np.float64)
+            if row.sum() == 0:
+                row[:] = 1
+            weights[main_id, ids] = row
+        return weights
 
-        # --- DRAWING LAYERS ---
-        
-        # 1. Body/Head
-        # Head
-        draw.ellipse([200, 50, 300, 160], fill=c_skin)
-        # Neck
-        draw.rectangle([235, 150, 265, 190], fill=c_skin)
-        
-        meta = outfit["meta"]
-        items = outfit["items"]
+    @staticmethod
+    def accent_matrix(color_scores):
+        # P[main, accent] as in OutfitGenerator.get_complementary_color
+        weights = LookScorer.pairing_matrix(color_scores)
+        return weights / weights.sum(axis=1, keepdims=True)
 
-        # 2. Bottoms
-        # If skirt, draw specialized shape
-        pants_color = c_main # Monochromatic base usually looks good for bottoms
-        
-        if meta["is_skirt"]:
-            # Skirt shape
-            draw.polygon([
-                (180, 450), (320, 450), # Waist
-                (360, 650), (140, 650)  # Hem
-            ], fill=pants_color)
-            # Legs
-            draw.rectangle([210, 650, 240, 800], fill=c_skin)
-            draw.rectangle([260, 650, 290, 800], fill=c_skin)
-        else:
-            # Pants shape
-            draw.rectangle([180, 450, 320, 800], fill=pants_color)
-            # Gap between legs
-            draw.polygon([(245, 450), (255, 450), (255, 800), (245, 800)], fill=(250,250,250)) 
-
-        # 3. Inner Top
-        inner_color = c_accent
-        draw.rectangle([180, 180, 320, 460], fill=inner_color) # Torso
-        draw.rectangle([150, 180, 190, 350], fill=inner_color) # Left Arm base
-        draw.rectangle([310, 180, 350, 350], fill=inner_color) # Right Arm base
-        
-        # Hands
-        draw.ellipse([140, 340, 190, 390], fill=c_skin)
-        draw.ellipse([310, 340, 360, 390], fill=c_skin)
-
-        # 4. Outerwear (if creates)
-        if meta["has_outer"] and items["outer"]:
-            outer_color = c_main
-            # Open Jacket look
-            draw.rectangle([140, 170, 210, 480], fill=outer_color) # Left panel
-            draw.rectangle([290, 170, 360, 480], fill=outer_color) # Right panel
-            # Sleeves
-            draw.rectangle([120, 180, 170, 420], fill=outer_color)
-            draw.rectangle([330, 180, 380, 420], fill=outer_color)
-
-        # 5. Shoes
-        shoe_color = (30,30,30)
-        draw.rectangle([190, 800, 240, 850], fill=shoe_color)
-        draw.rectangle([260, 800, 310, 850], fill=shoe_color)
-
-        # Resize for better quality (Antialiasing hack)
-        return img.resize((250, 450), resample=Image.LANCZOS)
+    @staticmethod
+    def score(style_weights, color_weights, color_scores):
+        genre_p = np.asarray(style_weights, dtype=np.float64)
+        color_p = np.asarray(color_weights, dtype=np.float64)
+        genre_p = genre_p / genre_p.sum()
+        color_p = color_p / color_p.sum()
+        accent_p = LookScorer.accent_matrix(color_scores)
+        return genre_p[:, None, None] * (color_p[:, None] * accent_p)[None, :, :]
+
+    @staticmethod
+    def preference(style_weights, color_weights, color_scores):
+        """
+        genre weight x main color weight x accent score for every valid
+        pairing. Unlike score(), accents are not normalised per main color,
+        so a main color with few pairings is not ranked up for it.
+        """
+        genre_w = np.asarray(style_weights, dtype=np.float64)
+        color_w = np.asarray(color_weights, dtype=np.float64)
+        accent_w = LookScorer.pairing_matrix(color_scores)
+        return genre_w[:, None, None] * (color_w[:, None] * accent_w)[None, :, :]
+
+    @staticmethod
+    def top_k(scores, k):
+        """The k highest-scoring (genre_id, color_id, accent_id), best first; rank by preference()."""
+        flat = scores.ravel()
+        k = min(k, int(np.count_nonzero(flat)))
+        # Stable sort: ties keep ID order, so the same inputs give the same picks
+        best = np.argsort(-flat, kind="stable")[:k]
+        return [tuple(int(i) for i in np.unravel_index(idx, scores.shape)) for idx in best]
+
+    @staticmethod
+    def sample(scores, k, rng=random):
+        """k distinct looks drawn in proportion to their score."""
+        flat = scores.ravel()
+        picked = weighted_sample(range(flat.size), flat.tolist(), k, rng)
+        return [tuple(int(i) for i in np.unravel_index(idx, scores.shape)) for idx in picked]
+
+    @staticmethod
+    def diverse(scores, looks, k):
+        """k of the candidate looks by MMR: high scores, but unlike genres and colors."""
+        ids = np.array(looks).reshape(-1, 3)
+        similarity = (
+            CandidateSimilarity()
+            .add_table(ids[:, 0], STYLE.genre_similarity, 0.4)
+            .add_table(ids[:, 1], STYLE.color_similarity, 0.4)
+            .add_table(ids[:, 2], STYLE.color_similarity, 0.2)
+        )
+        relevance = scores[ids[:, 0], ids[:, 1], ids[:, 2]]
+        return [looks[i] for i in mmr_select(relevance, similarity.row, k)]
 
 # ==============================================================================
 # UI COMPONENTS
@@ -366,6 +374,7 @@ def sidebar_controls():
         st.subheader("Identity")
         gender = st.selectbox("Gender", ["Male", "Female"], index=1)
         use_outer = st.toggle("Include Outerwear", value=True)
+        top_picks = st.toggle("Top Picks Only", value=False, help="Always show the highest-scoring looks")
         
         st.divider()
         
@@ -397,6 +406,7 @@ def sidebar_controls():
             return {
                 "gender": gender,
                 "use_outer": use_outer,
+                "top_picks": top_picks,
                 "style_scores": style_scores,
                 "color_scores": color_scores,
                 "trigger": True
@@ -423,24 +433,22 @@ def main():
         style_scores = config["style_scores"]
         color_scores = config["color_scores"]
         
-        # 1. Infer Style Weights
-        all_genres = list(style_scores.keys())
+        # 1. Infer Style Weights (indexed by genre ID)
+        all_genres = STYLE.genres
         style_weights = RecommendationEngine.infer_weights(
-            style_scores, 
-            StyleConfig.GENRE_RELATIONS, 
-            all_genres
+            STYLE.genre_vector(style_scores), 
+            STYLE.genre_affinity
         )
         
         # Safety fallback
         if sum(style_weights) == 0: 
             style_weights = [1] * len(all_genres)
 
-        # 2. Infer Color Weights
-        all_colors = list(color_scores.keys())
+        # 2. Infer Color Weights (indexed by color ID)
+        all_colors = STYLE.colors
         color_weights = RecommendationEngine.infer_weights(
-            color_scores, 
-            StyleConfig.COLOR_RELATIONS, 
-            all_colors
+            STYLE.color_vector(color_scores), 
+            STYLE.color_affinity
         )
         
         # Safety fallback
@@ -453,28 +461,36 @@ def main():
             "colors": dict(zip(all_colors, color_weights))
         }
 
-        for _ in range(3):
-            # Weighted selection for Genre
-            # random.choices returns a list, we take [0]
-            g = random.choices(all_genres, weights=style_weights, k=1)[0]
-            # Weighted selection for Main Color
-            c = random.choices(all_colors, weights=color_weights, k=1)[0]
-            
-            outfit = OutfitGenerator.create(g, c, config["gender"], config["use_outer"], color_scores)
+        # Same session + same inputs + same click count -> same looks
+        rng = session_rng(st.session_state, config)
+
+        # Score every genre / main color / accent combination, take a pool of
+        # distinct looks and keep the 3 that are good but least alike
+        if config["top_picks"]:
+            look_scores = LookScorer.preference(style_weights, color_weights, color_scores)
+            pool = LookScorer.top_k(look_scores, MMR_POOL)
+        else:
+            look_scores = LookScorer.score(style_weights, color_weights, color_scores)
+            pool = LookScorer.sample(look_scores, MMR_POOL, rng)
+        looks = LookScorer.diverse(look_scores, pool, 3)
+
+        for g, c, a in looks:
+            outfit = OutfitGenerator.create(
+                g, c, config["gender"], config["use_outer"], color_scores, rng, accent_id=a
+            )
             new_outfits.append(outfit)
             
         st.session_state["outfits"] = new_outfits
 
     # Display Gallery
     if st.session_state["outfits"]:
+        # All looks in one image: a single encode/upload, one avatar above each column
+        strip = AvatarRenderer.encode_strip(st.session_state["outfits"], backend=AVATAR_BACKEND)
+        st.image(strip.data, output_format=strip.format, use_container_width=True)
         cols = st.columns(3)
         
         for idx, (col, outfit) in enumerate(zip(cols, st.session_state["outfits"])):
             with col:
-                # Custom container style via markdown hack or just clean layout
-                img = AvatarRenderer.render(outfit)
-                st.image(img, use_container_width=True)
-                
                 st.markdown(f"### {outfit['genre']}")
                 st.caption(f"{outfit['main_color']} & {outfit['accent_color']}")
                 
@@ -510,6 +526,11 @@ def main():
                         norm_v = v / max_c
                         st.progress(norm_v, text=f"{k}: {v:.1f}")
 
+                stats = cache_stats().get("infer_weights")
+                if stats:
+                    st.caption(f"Inference cache: {stats['hits']} hits / {stats['misses']} misses")
+                st.caption(f"Avatar strip: {strip.size / 1024:.1f} KB, encoded in {strip.encode_ms:.1f} ms")
+
     else:
         st.info("👈 Select your preferences in the sidebar and click 'Generate Collection' to start.")
 